@@ -1,4 +1,12 @@
-from django.db.models import Count, Q, OuterRef, Exists, CharField
+from django.db import IntegrityError, connection, transaction
+from django.db.models import (
+    Q,
+    OuterRef,
+    Exists,
+    Subquery,
+    CharField,
+    IntegerField,
+)
 from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
 
@@ -7,9 +15,13 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 
-from classification.models import ConfirmedAlike, SuggestAlike
+from classification.models import (
+    AlikeVoteCount,
+    ConfirmedAlike,
+    SuggestAlike,
+)
 from games.models import SwitchGame
-from games.api.game import game_to_json, games_all_base_query
+from games.api.game import games_to_json, games_all_base_query_no_user
 from eshop_crawler.settings import VOTE_ALIKE_UPPERBOUND, VOTE_ALIKE_LOWERBOUND
 
 
@@ -25,20 +37,19 @@ def all_confirmed_alike(request, game_code):
 
     games_ids = map(lambda x: x['game2_id'], alike_query)
 
-    games_query = games_all_base_query(request.user, country) \
+    games_query = games_all_base_query_no_user(country) \
         .filter(id__in=games_ids) \
-        .annotate(votes=Count('suggested_alike_game2',
-                              filter=Q(suggested_alike_game2__game1=game))) \
+        .annotate(votes=alike_votes(game.id)) \
         .order_by('-votes', 'game_title')
 
     games_list = []
-    for game in games_query:
+    for game_json in games_to_json(games_query, request.user):
         # If game already in games_list list, skip it
         if len(games_list) and \
-                games_list[-1]['game_code'] == game.game_code_unique:
+                games_list[-1]['game_code'] == game_json['game_code']:
             continue
 
-        games_list.append(game_to_json(game, request.user))
+        games_list.append(game_json)
 
     return Response(games_list, status=status.HTTP_200_OK)
 
@@ -80,19 +91,10 @@ def alike_admin_post(request, game1_id, game2_id):
     except ConfirmedAlike.DoesNotExist:
         pass
 
-    confirmed_alike1 = ConfirmedAlike(
-        game1=game1, game2=game2, confirmed_by='STF')
-
-    confirmed_alike2 = ConfirmedAlike(
-        game1=game2, game2=game1, confirmed_by='STF')
-
     try:
-        confirmed_alike1.save()
-        confirmed_alike2.save()
+        confirm_alike(game1.id, game2.id, 'STF')
         return Response(status=status.HTTP_200_OK)
     except Exception as e:
-        confirmed_alike1.delete()
-        confirmed_alike2.delete()
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -100,15 +102,11 @@ def alike_admin_delete(request, game1_id, game2_id):
     game1 = get_object_or_404(SwitchGame, id=game1_id)
     game2 = get_object_or_404(SwitchGame, id=game2_id)
 
-    confirmed_alike1 = get_object_or_404(
-        ConfirmedAlike, confirmed_by='STF', game1=game1, game2=game2)
-
-    confirmed_alike2 = get_object_or_404(
+    get_object_or_404(
         ConfirmedAlike, confirmed_by='STF', game1=game1, game2=game2)
 
     try:
-        confirmed_alike1.delete()
-        confirmed_alike2.delete()
+        unconfirm_alike(game1.id, game2.id, 'STF')
         return Response(status=status.HTTP_200_OK)
     except Exception as e:
         print('Error deleting alike for games {} and {}'
@@ -121,13 +119,19 @@ def alike_admin_delete(request, game1_id, game2_id):
 def all_voted_alike_user(request, game_code):
     game = get_object_or_404(SwitchGame, game_code_unique=game_code)
 
-    query = SuggestAlike.objects \
-        .filter(game1=game, user=request.user) \
-        .annotate(game2_title=Coalesce('game2__game_eu__title',
-                                       'game2__game_us__title'))
+    voted_ids = [
+        game1_id if game2_id == game.id else game2_id
+        for game1_id, game2_id in SuggestAlike.objects
+        .filter(Q(game1=game) | Q(game2=game), user=request.user)
+        .values_list('game1_id', 'game2_id')
+    ]
+
+    query = SwitchGame.objects \
+        .filter(id__in=voted_ids) \
+        .annotate(game_title=Coalesce('game_eu__title', 'game_us__title'))
 
-    response = map(lambda x: {'game_code': x.game2.game_code_unique,
-                              'title': x.game2_title}, query)
+    response = map(lambda x: {'game_code': x.game_code_unique,
+                              'title': x.game_title}, query)
 
     return Response(response, status=status.HTTP_200_OK)
 
@@ -149,30 +153,26 @@ def vote_alike_post(request, game1_code, game2_code):
     if game1 == game2:
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
+    game1_id, game2_id = alike_pair(game1.id, game2.id)
+
     # If already exists, raise an error
-    try:
-        instance = SuggestAlike.objects.get(
-            game1=game1, game2=game2, user=request.user)
+    if SuggestAlike.objects.filter(
+            game1_id=game1_id, game2_id=game2_id, user=request.user).exists():
         return Response(status=status.HTTP_400_BAD_REQUEST)
-    except SuggestAlike.DoesNotExist:
-        pass
-
-    vote_alike1 = SuggestAlike(game1=game1, game2=game2, user=request.user)
-    vote_alike2 = SuggestAlike(game1=game2, game2=game1, user=request.user)
 
     try:
-        vote_alike1.save()
-        vote_alike2.save()
-        confirm_alike_by_vote(game1, game2)
+        with transaction.atomic():
+            SuggestAlike.objects.create(
+                game1_id=game1_id, game2_id=game2_id, user=request.user)
+            confirm_alike_by_vote(
+                game1_id, game2_id, count_alike_vote(game1_id, game2_id, 1))
         return Response(status=status.HTTP_200_OK)
 
-    except Exception as e:
-        if vote_alike1.id:
-            vote_alike1.delete()
-
-        if vote_alike2.id:
-            vote_alike2.delete()
+    # Voted at the same time by another request
+    except IntegrityError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
 
+    except Exception as e:
         return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
@@ -180,16 +180,23 @@ def vote_alike_delete(request, game1_code, game2_code):
     game1 = get_object_or_404(SwitchGame, game_code_unique=game1_code)
     game2 = get_object_or_404(SwitchGame, game_code_unique=game2_code)
 
-    vote_alike1 = get_object_or_404(
-        SuggestAlike, user=request.user, game1=game1, game2=game2)
+    game1_id, game2_id = alike_pair(game1.id, game2.id)
 
-    vote_alike2 = get_object_or_404(
-        SuggestAlike, user=request.user, game1=game2, game2=game1)
+    vote_alike = get_object_or_404(
+        SuggestAlike, user=request.user, game1_id=game1_id, game2_id=game2_id)
 
     try:
-        vote_alike1.delete()
-        vote_alike2.delete()
-        unconfirm_alike_by_vote(game1, game2)
+        with transaction.atomic():
+            # Only counted if this request deleted it, and not another one
+            # at the same time
+            deleted, _ = SuggestAlike.objects \
+                .filter(pk=vote_alike.pk) \
+                .delete()
+
+            if deleted:
+                unconfirm_alike_by_vote(
+                    game1_id, game2_id,
+                    count_alike_vote(game1_id, game2_id, -1))
         return Response(status=status.HTTP_200_OK)
 
     except Exception as e:
@@ -198,50 +205,68 @@ def vote_alike_delete(request, game1_code, game2_code):
         return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-def confirm_alike_by_vote(game1, game2):
-    votes_count = SuggestAlike.objects \
-        .filter(game1=game1, game2=game2).count()
+# Pairs of games are saved with the lowest id first
+def alike_pair(game1_id, game2_id):
+    return min(game1_id, game2_id), max(game1_id, game2_id)
 
-    if votes_count >= VOTE_ALIKE_UPPERBOUND:
 
-        if ConfirmedAlike.objects \
-                .filter(game1=game1, game2=game2, confirmed_by='VOT') \
-                .count() == 0:
+# Votes for the pair of the game with the given id and the game (or the
+# 'outer_ref' field) of the outer query, whichever comes first
+def alike_votes(game_id, outer_ref='id'):
+    votes = AlikeVoteCount.objects \
+        .filter(Q(game1_id=game_id, game2_id=OuterRef(outer_ref)) |
+                Q(game1_id=OuterRef(outer_ref), game2_id=game_id)) \
+        .values('votes')[:1]
 
-            confirmed_alike1 = ConfirmedAlike(
-                game1=game1, game2=game2, confirmed_by='VOT')
-            confirmed_alike1.save()
+    return Coalesce(Subquery(votes, output_field=IntegerField()), 0)
 
-        if ConfirmedAlike.objects \
-                .filter(game1=game2, game2=game1, confirmed_by='VOT') \
-                .count() == 0:
 
-            confirmed_alike2 = ConfirmedAlike(
-                game1=game2, game2=game1, confirmed_by='VOT')
-            confirmed_alike2.save()
+# Adds 'delta' to the votes of the pair with a single statement, returning
+# the new count. The counter stays locked until the end of the transaction,
+# so votes for the same pair are confirmed (or not) one at a time
+def count_alike_vote(game1_id, game2_id, delta):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO {0} (game1_id, game2_id, votes) '
+            'VALUES (%s, %s, GREATEST(%s, 0)) '
+            'ON CONFLICT (game1_id, game2_id) DO UPDATE '
+            'SET votes = GREATEST({0}.votes + %s, 0) '
+            'RETURNING votes'
+            .format(AlikeVoteCount._meta.db_table),
+            [game1_id, game2_id, delta, delta])
 
+        return cursor.fetchone()[0]
 
-def unconfirm_alike_by_vote(game1, game2):
-    votes_count = SuggestAlike.objects \
-        .filter(game1=game1, game2=game2).count()
 
-    if votes_count <= VOTE_ALIKE_LOWERBOUND:
+# Confirmed alikes are still saved in both directions, so games' queries
+# read them from a single side. Both are written by a single statement
+def confirm_alike(game1_id, game2_id, confirmed_by):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO {} (game1_id, game2_id, confirmed_by) '
+            'VALUES (%s, %s, %s), (%s, %s, %s) '
+            'ON CONFLICT (game1_id, game2_id, confirmed_by) DO NOTHING'
+            .format(ConfirmedAlike._meta.db_table),
+            [game1_id, game2_id, confirmed_by,
+             game2_id, game1_id, confirmed_by])
 
-        if ConfirmedAlike.objects \
-                .filter(game1=game1, game2=game2, confirmed_by='VOT') \
-                .count():
 
-            confirmed_alike1 = ConfirmedAlike.objects.get(
-                game1=game1, game2=game2, confirmed_by='VOT')
-            confirmed_alike1.delete()
+def unconfirm_alike(game1_id, game2_id, confirmed_by):
+    ConfirmedAlike.objects \
+        .filter(Q(game1_id=game1_id, game2_id=game2_id) |
+                Q(game1_id=game2_id, game2_id=game1_id)) \
+        .filter(confirmed_by=confirmed_by) \
+        .delete()
 
-        if ConfirmedAlike.objects \
-                .filter(game1=game2, game2=game1, confirmed_by='VOT') \
-                .count():
 
-            confirmed_alike2 = ConfirmedAlike.objects.get(
-                game1=game2, game2=game1, confirmed_by='VOT')
-            confirmed_alike2.delete()
+def confirm_alike_by_vote(game1_id, game2_id, votes_count):
+    if votes_count >= VOTE_ALIKE_UPPERBOUND:
+        confirm_alike(game1_id, game2_id, 'VOT')
+
+
+def unconfirm_alike_by_vote(game1_id, game2_id, votes_count):
+    if votes_count <= VOTE_ALIKE_LOWERBOUND:
+        unconfirm_alike(game1_id, game2_id, 'VOT')
 
 
 @api_view(['GET'])
@@ -1,23 +1,31 @@
+import json
+
 from django.contrib.auth import get_user_model
 from django.contrib.postgres.aggregates import ArrayAgg
 from django.db.models import F, CharField
 from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 
 from games.models import SwitchGame
 from games.api.game import games_all_base_query
+from games.api.pagination import decode_cursor, paginate_by_cursor
 from eshop_crawler.settings import (
     VOTE_RECOMENDATION_UPPERBOUND,
     VOTE_RECOMENDATION_LOWERBOUND,
 )
 
 from ..models import Recomendation, ConfirmedHighlight, Wishlist
-from ..serializers import RecomendationSerializer, recomendation_to_json
+from ..serializers import RecomendationSerializer, recomendations_to_json
+
+
+RECOMENDATIONS_STREAM_CHUNK = 100
 
 
 @api_view(['GET', 'POST', 'DELETE'])
@@ -111,10 +119,8 @@ def user_recomendations(user):
         .order_by('-date')[:10]
 
     response = {}
-    response['likes'] = map(
-        lambda x: recomendation_to_json(x, user), likes)
-    response['dislikes'] = map(
-        lambda x: recomendation_to_json(x, user), dislikes)
+    response['likes'] = recomendations_to_json(likes, user)
+    response['dislikes'] = recomendations_to_json(dislikes, user)
 
     return Response(response, status=status.HTTP_200_OK)
 
@@ -122,24 +128,85 @@ def user_recomendations(user):
 @api_view(['GET'])
 @permission_classes((IsAuthenticated,))
 def current_user_all_recomendations(request, recomends):
-    return user_all_recomendations(request.user, recomends)
+    return user_all_recomendations(request, request.user, recomends)
 
 
 @api_view(['GET'])
 def username_user_all_recomendations(request, username, recomends):
     user = get_object_or_404(get_user_model(), username=username)
-    return user_all_recomendations(user, recomends)
+    return user_all_recomendations(request, user, recomends)
 
 
-def user_all_recomendations(user, recomends):
-    recomendations = recomendation_all_base_query() \
-        .filter(user=user, recomends=(recomends == 'likes')) \
-        .order_by('-date')
+def user_all_recomendations(request, user, recomends):
+    quantity = request.query_params.get('qtd', None)
+    offset = request.query_params.get('offset', 0)
+    cursor = request.query_params.get('cursor', None)
 
-    response = map(lambda x: recomendation_to_json(x, user), recomendations)
+    if quantity:
+        quantity = int(quantity)
+    if offset:
+        offset = int(offset)
+
+    recomendations = recomendation_all_base_query() \
+        .filter(user=user, recomends=(recomends == 'likes'))
+
+    if cursor is not None:
+        try:
+            recomendations, next_cursor = paginate_by_cursor(
+                recomendations, ['-date', 'id'], decode_cursor(cursor),
+                quantity)
+        except ValueError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        response = {
+            'recomendations': recomendations_to_json(recomendations, user),
+            'next_cursor': next_cursor,
+        }
+        return Response(response, status=status.HTTP_200_OK)
+
+    # Without a cursor or quantity, the whole list is streamed, a chunk of
+    # recomendations at a time, instead of being built in memory first
+    if not quantity:
+        return StreamingHttpResponse(
+            recomendations_json_stream(recomendations, user),
+            content_type='application/json')
+
+    recomendations = recomendations.order_by('-date', 'id')[
+        offset: offset + quantity
+    ]
+
+    response = recomendations_to_json(recomendations, user)
     return Response(response, status=status.HTTP_200_OK)
 
 
+# Yields the recomendations as a JSON array, going through them by cursor,
+# so each chunk costs the same few queries however far into the list it is
+def recomendations_json_stream(recomendations, user):
+    yield '['
+
+    state = {}
+    first = True
+
+    while True:
+        page, next_cursor = paginate_by_cursor(
+            recomendations, ['-date', 'id'], state,
+            RECOMENDATIONS_STREAM_CHUNK)
+
+        for recomendation_json in recomendations_to_json(page, user):
+            if not first:
+                yield ','
+            first = False
+
+            yield json.dumps(recomendation_json, cls=JSONEncoder)
+
+        if next_cursor is None:
+            break
+
+        state = decode_cursor(next_cursor)
+
+    yield ']'
+
+
 @api_view(['POST', 'DELETE'])
 @permission_classes((IsAuthenticated, IsAdminUser))
 def highlight_admin(request, game_id):
@@ -1,5 +1,5 @@
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Q, F
+from django.db.models import F
 from django.shortcuts import get_object_or_404
 
 from rest_framework import status
@@ -7,13 +7,15 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from games.api.pagination import decode_cursor, paginate_by_cursor
 from games.models import SwitchGame
 from classification.api.recomendation import confirm_highlight_by_vote
 from classification.models import Review, VoteReview
 from classification.serializers import (
     ReviewSerializer,
     VoteReviewSerializer,
-    review_to_json,
+    reviews_annotate_votes,
+    reviews_to_json,
 )
 
 
@@ -140,24 +142,40 @@ def review_vote_delete(request, review_id):
 def all_reviews(request, game_code):
     quantity = request.query_params.get('qtd', None)
     offset = request.query_params.get('offset', 0)
+    cursor = request.query_params.get('cursor', None)
 
     if quantity:
         quantity = int(quantity)
-
-    reviews = []
+    if offset:
+        offset = int(offset)
 
     reviews_query = Review.objects \
         .filter(game__game_code_unique=game_code) \
-        .annotate(useful=Count('votereview',
-                               filter=Q(votereview__vote__exact=True))) \
-        .annotate(not_useful=Count('votereview',
-                                   filter=Q(votereview__vote__exact=False))) \
-        .annotate(vote_sum=F('useful') - F('not_useful')) \
-        .order_by(
-            '-vote_sum', '-last_update_date'
-        )[offset: offset + quantity if quantity else None]
-
-    for review in reviews_query:
-        reviews.append(review_to_json(review, request.user))
+        .select_related('user', 'recomendation')
+
+    reviews_query = reviews_annotate_votes(reviews_query) \
+        .annotate(vote_sum=F('useful') - F('not_useful'))
+
+    if cursor is not None:
+        try:
+            reviews_query, next_cursor = paginate_by_cursor(
+                reviews_query,
+                ['-vote_sum', '-last_update_date', 'id'],
+                decode_cursor(cursor),
+                quantity)
+        except ValueError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        response = {
+            'reviews': reviews_to_json(reviews_query, request.user),
+            'next_cursor': next_cursor,
+        }
+        return Response(response, status=status.HTTP_200_OK)
+
+    reviews_query = reviews_query.order_by(
+        '-vote_sum', '-last_update_date'
+    )[offset: offset + quantity if quantity else None]
+
+    reviews = reviews_to_json(reviews_query, request.user)
 
     return Response(reviews, status=status.HTTP_200_OK)
@@ -1,4 +1,4 @@
-from django.db import IntegrityError
+from django.db import IntegrityError, connection, transaction
 from django.db.models import CharField, Count, Q, F, OuterRef, Exists
 from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
@@ -8,7 +8,13 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 
-from classification.models import ConfirmedTag, TagGroup, Tag, SuggestedTag
+from classification.models import (
+    ConfirmedTag,
+    TagGroup,
+    Tag,
+    SuggestedTag,
+    TagVoteCount,
+)
 from games.models import SwitchGame
 from eshop_crawler.settings import VOTE_TAG_UPPERBOUND, VOTE_TAG_LOWERBOUND
 
@@ -277,6 +283,7 @@ def tag_merge(request, tag1_id, tag2_id):
                 item.delete()
 
     tag2.delete()
+    rebuild_tag_vote_counts(tag_id=tag1_id)
 
     return Response(status=status.HTTP_200_OK)
 
@@ -396,13 +403,16 @@ def vote_tag_post(request, tag_id, game_code):
     except SuggestedTag.DoesNotExist:
         pass
 
-    vote_tag = SuggestedTag(game=game, tag=tag, user=request.user)
-
     try:
-        vote_tag.save()
-        confirm_tag_by_vote(game, tag)
+        with transaction.atomic():
+            SuggestedTag.objects.create(game=game, tag=tag, user=request.user)
+            confirm_tag_by_vote(game, tag, count_tag_vote(tag, game, 1))
         return Response(status=status.HTTP_200_OK)
 
+    # Voted at the same time by another request
+    except IntegrityError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
     except Exception as e:
         return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -415,39 +425,77 @@ def vote_tag_delete(request, tag_id, game_code):
         SuggestedTag, game=game, tag=tag, user=request.user)
 
     try:
-        vote_tag.delete()
-        unconfirm_tag_by_vote(game, tag)
+        with transaction.atomic():
+            # Only counted if this request deleted it, and not another one
+            # at the same time
+            deleted, _ = SuggestedTag.objects \
+                .filter(pk=vote_tag.pk) \
+                .delete()
+
+            if deleted:
+                unconfirm_tag_by_vote(
+                    game, tag, count_tag_vote(tag, game, -1))
         return Response(status=status.HTTP_200_OK)
 
     except Exception as e:
-        print('Error deleting alike for games {} and {}'
-              .format(game1, game2))
+        print('Error deleting vote for tag {} of game {}'
+              .format(tag, game))
         return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-def confirm_tag_by_vote(game, tag):
-    votes_count = SuggestedTag.objects.filter(game=game, tag=tag).count()
+# Adds 'delta' to the votes of the tag for the game with a single statement,
+# returning the new count. The counter stays locked until the end of the
+# transaction, so votes for the same tag and game are confirmed (or not) one
+# at a time
+def count_tag_vote(tag, game, delta):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO {0} (tag_id, game_id, votes) '
+            'VALUES (%s, %s, GREATEST(%s, 0)) '
+            'ON CONFLICT (tag_id, game_id) DO UPDATE '
+            'SET votes = GREATEST({0}.votes + %s, 0) '
+            'RETURNING votes'
+            .format(TagVoteCount._meta.db_table),
+            [tag.id, game.id, delta, delta])
 
-    if votes_count >= VOTE_TAG_UPPERBOUND:
-        if ConfirmedTag.objects \
-                .filter(game=game, tag=tag, confirmed_by='VOT') \
-                .count() == 0:
+        return cursor.fetchone()[0]
 
-            confirmed = ConfirmedTag(game=game, tag=tag, confirmed_by='VOT')
-            confirmed.save()
 
+def confirm_tag_by_vote(game, tag, votes_count):
+    if votes_count >= VOTE_TAG_UPPERBOUND:
+        ConfirmedTag.objects.get_or_create(
+            game=game, tag=tag, confirmed_by='VOT')
 
-def unconfirm_tag_by_vote(game, tag):
-    votes_count = SuggestedTag.objects.filter(game=game, tag=tag).count()
 
+def unconfirm_tag_by_vote(game, tag, votes_count):
     if votes_count <= VOTE_TAG_LOWERBOUND:
-        if ConfirmedTag.objects \
-                .filter(game=game, tag=tag, confirmed_by='VOT') \
-                .count():
+        ConfirmedTag.objects \
+            .filter(game=game, tag=tag, confirmed_by='VOT') \
+            .delete()
+
+
+# Counts the votes again, for when they're moved between tags or games
+def rebuild_tag_vote_counts(tag_id=None, game_id=None):
+    votes = SuggestedTag.objects.all()
+    counts = TagVoteCount.objects.all()
+
+    if tag_id is not None:
+        votes = votes.filter(tag_id=tag_id)
+        counts = counts.filter(tag_id=tag_id)
+
+    if game_id is not None:
+        votes = votes.filter(game_id=game_id)
+        counts = counts.filter(game_id=game_id)
+
+    votes = votes \
+        .values('tag_id', 'game_id') \
+        .annotate(votes=Count('id')) \
+        .order_by()
 
-            confirmed = ConfirmedTag.objects.get(
-                game=game, tag=tag, confirmed_by='VOT')
-            confirmed.delete()
+    with transaction.atomic():
+        counts.delete()
+        TagVoteCount.objects.bulk_create(
+            [TagVoteCount(**vote) for vote in votes])
 
 
 # SUGGESTED TAGS
@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404
+from django.utils.timezone import now
 
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
@@ -7,28 +8,76 @@ from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 
 from classification.models import Wishlist
-from games.api.game import games_all_base_query, game_to_json
-from games.models import SwitchGame
-from django.db.models import F, Q
+from games.api.game import games_all_base_query_no_user, games_to_json
+from games.api.pagination import decode_cursor, paginate_by_cursor
+from games.models import SwitchGame, SwitchGameSale
+from django.db.models import Q
 
 
+# The user's wishes are listed (and paginated) on their own, and only the
+# games of the page are then read from the summaries, so the cost of a page
+# doesn't grow with the size of the wishlist
 @api_view(['GET'])
 @permission_classes((IsAuthenticated,))
 def wishlist(request):
     country = request.query_params.get('country', 'US')
-
-    games = games_all_base_query(request.user, country) \
-        .filter(wishlist__user=request.user) \
-        .annotate(wish_date=F('wishlist__date')) \
-        .filter(has_wish__gte=1) \
-        .order_by('-wish_date')
-
-    # 'has_wish' filter is necessary because 'wish_date' annotate brings
-    # duplicates
-
-    response = []
-    for game in games:
-        response.append(game_to_json(game, request.user))
+    sales_only = request.query_params.get('sales_only', None)
+    quantity = request.query_params.get('qtd', None)
+    offset = request.query_params.get('offset', 0)
+    cursor = request.query_params.get('cursor', None)
+
+    if quantity:
+        quantity = int(quantity)
+    if offset:
+        offset = int(offset)
+
+    if cursor is not None:
+        try:
+            cursor = decode_cursor(cursor)
+        except ValueError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+    wishes = Wishlist.objects \
+        .filter(user=request.user, game__hide=False)
+
+    # Games on sale right now, in the given country
+    if sales_only:
+        wishes = wishes.filter(game_id__in=SwitchGameSale.objects
+                               .filter(country=country)
+                               .filter(Q(end_datetime__isnull=True) |
+                                       Q(end_datetime__gt=now()))
+                               .values('game_id'))
+
+    next_cursor = None
+    if cursor is not None:
+        try:
+            wishes, next_cursor = paginate_by_cursor(
+                wishes, ['-date', 'id'], cursor, quantity)
+        except ValueError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        game_ids = [wish.game_id for wish in wishes]
+    else:
+        game_ids = list(
+            wishes
+            .order_by('-date', 'id')
+            .values_list('game_id', flat=True)
+            [offset: offset + quantity if quantity else None]
+        )
+
+    games = {
+        game.id: game
+        for game in games_all_base_query_no_user(country)
+        .filter(id__in=game_ids)
+    }
+
+    # Back in the wishes' order
+    response = games_to_json(
+        [games[game_id] for game_id in game_ids if game_id in games],
+        request.user)
+
+    if cursor is not None:
+        response = {'games': response, 'next_cursor': next_cursor}
 
     return Response(response, status=status.HTTP_200_OK)
 
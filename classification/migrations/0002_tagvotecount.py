@@ -0,0 +1,42 @@
+# Generated by Django 2.1 on 2026-10-18 12:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Counts the votes already cast
+def count_tag_votes(apps, schema_editor):
+    SuggestedTag = apps.get_model('classification', 'SuggestedTag')
+    TagVoteCount = apps.get_model('classification', 'TagVoteCount')
+
+    votes = SuggestedTag.objects \
+        .values('tag_id', 'game_id') \
+        .annotate(votes=models.Count('id')) \
+        .order_by()
+
+    TagVoteCount.objects.bulk_create(
+        [TagVoteCount(**vote) for vote in votes], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0008_switchgamepriceevent'),
+        ('classification', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagVoteCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('votes', models.IntegerField(default=0)),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='games.SwitchGame')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='classification.Tag')),
+            ],
+            options={
+                'unique_together': {('tag', 'game')},
+            },
+        ),
+        migrations.RunPython(count_tag_votes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 2.1 on 2026-10-18 12:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Keeps a single vote per pair of games, with the lowest id as 'game1', and
+# counts the votes already cast
+def count_alike_votes(apps, schema_editor):
+    SuggestAlike = apps.get_model('classification', 'SuggestAlike')
+    AlikeVoteCount = apps.get_model('classification', 'AlikeVoteCount')
+
+    table = SuggestAlike._meta.db_table
+
+    # Votes were saved in both directions
+    schema_editor.execute(
+        'DELETE FROM {0} AS vote WHERE vote.game1_id > vote.game2_id '
+        'AND EXISTS (SELECT 1 FROM {0} AS mirror '
+        'WHERE mirror.game1_id = vote.game2_id '
+        'AND mirror.game2_id = vote.game1_id '
+        'AND mirror.user_id = vote.user_id)'.format(table))
+
+    # Unless saving the second one failed
+    schema_editor.execute(
+        'UPDATE {} SET game1_id = game2_id, game2_id = game1_id '
+        'WHERE game1_id > game2_id'.format(table))
+
+    votes = SuggestAlike.objects \
+        .values('game1_id', 'game2_id') \
+        .annotate(votes=models.Count('id')) \
+        .order_by()
+
+    AlikeVoteCount.objects.bulk_create(
+        [AlikeVoteCount(**vote) for vote in votes], batch_size=1000)
+
+
+# Saves each vote in both directions again
+def mirror_alike_votes(apps, schema_editor):
+    SuggestAlike = apps.get_model('classification', 'SuggestAlike')
+
+    schema_editor.execute(
+        'INSERT INTO {0} (game1_id, game2_id, user_id) '
+        'SELECT game2_id, game1_id, user_id FROM {0} '
+        'ON CONFLICT (game1_id, game2_id, user_id) DO NOTHING'
+        .format(SuggestAlike._meta.db_table))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0008_switchgamepriceevent'),
+        ('classification', '0002_tagvotecount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlikeVoteCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('votes', models.IntegerField(default=0)),
+                ('game1', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alike_votes_game1', to='games.SwitchGame')),
+                ('game2', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alike_votes_game2', to='games.SwitchGame')),
+            ],
+            options={
+                'unique_together': {('game1', 'game2')},
+            },
+        ),
+        migrations.RunPython(count_alike_votes, mirror_alike_votes),
+    ]
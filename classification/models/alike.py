@@ -4,6 +4,8 @@ from django.contrib.auth import get_user_model
 from games.models import SwitchGame
 
 
+# A vote is saved once per pair of games, with the lowest id as 'game1', so
+# readers look for a game on either side
 class SuggestAlike(models.Model):
     game1 = models.ForeignKey(
         SwitchGame,
@@ -27,6 +29,31 @@ class SuggestAlike(models.Model):
             .format(self.user, self.game1, self.game2)
 
 
+# Votes of users for a pair of games, counted as they're cast, so a vote
+# never has to count the others. Saved with the lowest id as 'game1' too
+class AlikeVoteCount(models.Model):
+    game1 = models.ForeignKey(
+        SwitchGame,
+        on_delete=models.CASCADE,
+        related_name='alike_votes_game1',
+    )
+
+    game2 = models.ForeignKey(
+        SwitchGame,
+        on_delete=models.CASCADE,
+        related_name='alike_votes_game2',
+    )
+
+    votes = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('game1', 'game2')
+
+    def __str__(self):
+        return '{} is like {} - {} votes' \
+            .format(self.game1, self.game2, self.votes)
+
+
 class ConfirmedAlike(models.Model):
     NINTENDO = 'NTD'
     SITE_STAFF = 'STF'
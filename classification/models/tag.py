@@ -44,6 +44,21 @@ class SuggestedTag(models.Model):
             self.game, self.tag, self.value, self.user)
 
 
+# Votes of users for a tag of a game, counted as they're cast, so a vote
+# never has to count the others
+class TagVoteCount(models.Model):
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
+    game = models.ForeignKey(SwitchGame, on_delete=models.CASCADE)
+
+    votes = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('tag', 'game')
+
+    def __str__(self):
+        return '[{}] {} - {} votes'.format(self.game, self.tag, self.votes)
+
+
 class ConfirmedTag(models.Model):
     NINTENDO = 'NTD'
     SITE_STAFF = 'STF'
@@ -1,7 +1,11 @@
 from rest_framework import serializers
 
 from classification.models import Recomendation, Review
-from classification.serializers.review import review_to_json
+from classification.serializers.review import (
+    review_to_json,
+    reviews_annotate_votes,
+    reviews_user_votes,
+)
 
 
 class RecomendationSerializer(serializers.Serializer):
@@ -29,7 +33,10 @@ class RecomendationSerializer(serializers.Serializer):
         return instance
 
 
-def recomendation_to_json(recomendation, user):
+# 'reviews', when given, maps the ids of the reviews to the reviews, and
+# 'user_votes' the ids of the reviews to the user's votes, as fetched by
+# 'recomendations_to_json', and take the place of the queries
+def recomendation_to_json(recomendation, user, reviews=None, user_votes=None):
 
     game_json = {
         'title': recomendation.game_title,
@@ -42,6 +49,13 @@ def recomendation_to_json(recomendation, user):
 
     response = {'game': game_json}
 
+    if reviews is not None:
+        if recomendation.review_id in reviews:
+            response['review'] = review_to_json(
+                reviews[recomendation.review_id], user,
+                user_votes=user_votes)
+        return response
+
     try:
         review = Review.objects.get(id=recomendation.review_id)
         response['review'] = review_to_json(review, user)
@@ -49,3 +63,32 @@ def recomendation_to_json(recomendation, user):
         pass
 
     return response
+
+
+# Serializes a page of recomendations, fetching their reviews (with vote
+# counts, author and recomendation) and the user's votes on them with a
+# query each
+def recomendations_to_json(recomendations, user):
+    recomendations = list(recomendations)
+    review_ids = [
+        recomendation.review_id for recomendation in recomendations
+        if recomendation.review_id is not None
+    ]
+
+    reviews = {}
+    user_votes = {}
+
+    if len(review_ids):
+        reviews = {
+            review.id: review
+            for review in reviews_annotate_votes(
+                Review.objects
+                .filter(id__in=review_ids)
+                .select_related('user', 'recomendation'))
+        }
+        user_votes = reviews_user_votes(user, review_ids)
+
+    return [
+        recomendation_to_json(recomendation, user, reviews, user_votes)
+        for recomendation in recomendations
+    ]
@@ -1,4 +1,5 @@
 from django.contrib.auth.models import AnonymousUser
+from django.db.models import Count, Q
 from rest_framework import serializers
 
 from ..models import Review, Recomendation, VoteReview
@@ -67,23 +68,37 @@ class ReviewSerializer(serializers.Serializer):
         return instance
 
 
-def review_to_json(review, user, simple_version=False):
+# 'user_votes', when given, maps the ids of the reviews to the user's votes
+# on them, as returned by 'reviews_user_votes', and takes the place of the
+# vote query. Vote counts are read from the 'reviews_annotate_votes'
+# annotations, if the review has them
+def review_to_json(review, user, simple_version=False, user_votes=None):
     if type(user) == AnonymousUser:
         user = None
 
-    try:
-        vote = VoteReview.objects.get(user=user, review=review)
-    except VoteReview.DoesNotExist:
-        vote = None
+    if user_votes is not None:
+        vote = user_votes.get(review.id)
+    else:
+        try:
+            vote = VoteReview.objects.get(user=user, review=review).vote
+        except VoteReview.DoesNotExist:
+            vote = None
+
+    if hasattr(review, 'useful') and hasattr(review, 'not_useful'):
+        useful = review.useful
+        not_useful = review.not_useful
+    else:
+        useful = review.votereview_set.filter(vote=True).count()
+        not_useful = review.votereview_set.filter(vote=False).count()
 
     review_json = {
         'id': review.id,
         'review_text': review.review_text,
-        'useful': review.votereview_set.filter(vote=True).count(),
-        'not_useful': review.votereview_set.filter(vote=False).count(),
+        'useful': useful,
+        'not_useful': not_useful,
         'date': review.last_update_date,
         'has_edited': review.has_edited,
-        'vote': vote.vote if vote else None,
+        'vote': vote,
     }
 
     if not simple_version:
@@ -91,3 +106,35 @@ def review_to_json(review, user, simple_version=False):
         review_json['user'] = review.user.username
 
     return review_json
+
+
+# Serializes a page of reviews, fetching the user's votes on them with a
+# single query. Reviews should come from 'reviews_annotate_votes' and, unless
+# 'simple_version' is set, have their user and recomendation selected
+def reviews_to_json(reviews, user, simple_version=False):
+    reviews = list(reviews)
+    user_votes = reviews_user_votes(user, [review.id for review in reviews])
+
+    return [
+        review_to_json(review, user, simple_version, user_votes)
+        for review in reviews
+    ]
+
+
+def reviews_user_votes(user, review_ids):
+    if not user or type(user) == AnonymousUser:
+        return {}
+
+    return dict(
+        VoteReview.objects
+        .filter(user=user, review_id__in=review_ids)
+        .values_list('review_id', 'vote')
+    )
+
+
+def reviews_annotate_votes(query):
+    return query \
+        .annotate(useful=Count('votereview',
+                               filter=Q(votereview__vote__exact=True))) \
+        .annotate(not_useful=Count('votereview',
+                                   filter=Q(votereview__vote__exact=False)))
@@ -0,0 +1,49 @@
+from django.db import connection
+
+
+# Inserts the given model instances, 'batch_size' rows per statement,
+# updating the 'update_fields' of the rows that already exist with the same
+# 'conflict_fields', or leaving them untouched if there are no
+# 'update_fields'. Like 'bulk_create', it doesn't call 'save()' or send any
+# signals
+def bulk_upsert(model, instances, conflict_fields, update_fields=None,
+                batch_size=1000):
+    if len(instances) == 0:
+        return
+
+    fields = [field for field in model._meta.local_concrete_fields
+              if not field.primary_key]
+    quote = connection.ops.quote_name
+
+    if update_fields:
+        on_conflict = 'DO UPDATE SET ' + ', '.join(
+            '{0} = EXCLUDED.{0}'.format(
+                quote(model._meta.get_field(name).column))
+            for name in update_fields)
+    else:
+        on_conflict = 'DO NOTHING'
+
+    for start in range(0, len(instances), batch_size):
+        batch = instances[start:start + batch_size]
+
+        sql = 'INSERT INTO {} ({}) VALUES {} ON CONFLICT ({}) {}'.format(
+            quote(model._meta.db_table),
+            ', '.join(quote(field.column) for field in fields),
+            ', '.join(
+                ['({})'.format(', '.join(['%s'] * len(fields)))] *
+                len(batch)),
+            ', '.join(
+                quote(model._meta.get_field(name).column)
+                for name in conflict_fields),
+            on_conflict,
+        )
+
+        params = [
+            field.get_db_prep_save(
+                getattr(instance, field.attname), connection)
+            for instance in batch
+            for field in fields
+        ]
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 import djmail
 
 from datetime import timedelta
@@ -54,6 +55,12 @@ EMAIL_PORT = 587
 EMAIL_BACKEND = "djmail.backends.celery.EmailBackend"
 DJMAIL_REAL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 
+# Digests of the wished games that went on sale are sent with the prices of
+# WISHLIST_SALES_COUNTRY, queueing WISHLIST_SALES_EMAIL_BATCH emails per task
+WISHLIST_SALES_COUNTRY = get_site_var('WISHLIST_SALES_COUNTRY', 'US')
+WISHLIST_SALES_EMAIL_BATCH = int(
+    get_site_var('WISHLIST_SALES_EMAIL_BATCH', 100))
+
 # reCAPTCHA
 RECAPTCHA_SECRET_KEY = get_site_var('RECAPTCHA_SECRET_KEY')
 
@@ -207,6 +214,7 @@ CELERY_BEAT_SCHEDULE = {
         'schedule': crontab(hour='6', minute='15'),
         # 'args': (*args),
     },
+    # Also rebuilds the games' summary, once every price is updated
     'update_switch_price': {
         'task': 'games.tasks.update_switch_price.update_switch_price',
         'schedule': crontab(hour='6', minute='30'),
@@ -217,3 +225,41 @@ CELERY_BEAT_SCHEDULE = {
         'schedule': crontab(hour='*'),
     },
 }
+
+
+# Cache
+CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': get_site_var('CACHE_URL', CELERY_BROKER_URL),
+    }
+}
+
+
+# Crawlers
+# Requests to the eShop APIs share a pool of keep-alive connections, are
+# retried with an exponential backoff (plus up to REQUEST_BACKOFF_JITTER
+# seconds, at random), never more than REQUEST_HOST_CONCURRENCY of them run
+# at once on each host, and they're at least REQUEST_HOST_INTERVAL seconds
+# apart from each other on the same host
+REQUEST_CONNECT_TIMEOUT = float(get_site_var('REQUEST_CONNECT_TIMEOUT', 5))
+REQUEST_READ_TIMEOUT = float(get_site_var('REQUEST_READ_TIMEOUT', 30))
+REQUEST_RETRIES = int(get_site_var('REQUEST_RETRIES', 3))
+REQUEST_BACKOFF = float(get_site_var('REQUEST_BACKOFF', 1))
+REQUEST_BACKOFF_JITTER = float(get_site_var('REQUEST_BACKOFF_JITTER', 1))
+REQUEST_HOST_CONCURRENCY = int(get_site_var('REQUEST_HOST_CONCURRENCY', 4))
+REQUEST_HOST_INTERVAL = float(get_site_var('REQUEST_HOST_INTERVAL', 0.1))
+
+PRICE_API_URL = get_site_var(
+    'PRICE_API_URL', 'https://api.ec.nintendo.com/v1/price')
+PRICE_FETCH_WORKERS = int(get_site_var('PRICE_FETCH_WORKERS', 4))
+
+# Where the crawled catalogs are saved, for backfills to run over
+SNAPSHOT_DIR = get_site_var(
+    'SNAPSHOT_DIR', os.path.join(tempfile.gettempdir(), 'eshop_snapshots'))
+
+# 'live' requests the eShop APIs, 'record' also saves their responses to
+# REQUEST_SNAPSHOT_DIR and 'replay' reads them back from there instead
+REQUEST_MODE = get_site_var('REQUEST_MODE', 'live')
+REQUEST_SNAPSHOT_DIR = get_site_var(
+    'REQUEST_SNAPSHOT_DIR', os.path.join(SNAPSHOT_DIR, 'responses'))
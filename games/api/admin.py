@@ -23,6 +23,7 @@ from classification.models import (
     Review,
     SuggestedTag,
 )
+from classification.api.tag import rebuild_tag_vote_counts
 
 
 @api_view(['GET'])
@@ -145,6 +146,7 @@ def game_merge(request, game1_id, game2_id):
     try:
         game2.delete()
         game1.save()
+        rebuild_tag_vote_counts(game_id=game1_id)
         return Response(status=status.HTTP_200_OK)
     except Exception as e:
         return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
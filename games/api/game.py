@@ -1,3 +1,4 @@
+from collections import defaultdict
 from datetime import datetime
 from random import randint
 
@@ -9,6 +10,7 @@ from django.db.models import (
     Count,
     Subquery, OuterRef, Exists,
     When, Case, Value,
+    FilteredRelation,
 )
 from django.db.models.functions import Coalesce
 
@@ -22,6 +24,7 @@ from games.models import (
     SwitchGameEU,
     SwitchGamePrice,
     SwitchGameSale,
+    SwitchGameSummary,
 )
 
 from classification.models import (
@@ -68,7 +71,7 @@ def all_games_select_game_code(request):
 
 @api_view(['GET'])
 def game_get(request, game_code):
-    game = games_all_base_query(request.user) \
+    game = games_all_base_query_no_user('US') \
         .filter(game_code_unique=game_code) \
         .annotate(game_description=F('game_eu__description')) \
         .annotate(link_us=F('game_us__slug')) \
@@ -78,12 +81,14 @@ def game_get(request, game_code):
         return Response(status=status.HTTP_404_NOT_FOUND)
 
     else:
-        response = game_to_json(game[0], request.user)
+        response = games_to_json(game[:1], request.user)[0]
         return Response(response, status=status.HTTP_200_OK)
 
 
 # UTIL
-def game_to_json(game, user):
+# 'user_flags', when given, is the set of the user's flags for the game, as
+# returned by 'games_user_flags', and takes the place of the annotations
+def game_to_json(game, user, user_flags=None):
     if type(user) == AnonymousUser:
         user = None
 
@@ -117,6 +122,9 @@ def game_to_json(game, user):
     if hasattr(game, 'link_eu'):
         game_json['link_eu'] = game.link_eu
 
+    if user_flags is not None:
+        game_json_apply_user_flags(game_json, user_flags)
+
     if game.price_value != None:
         game_json['price'] = game.price_value
 
@@ -129,6 +137,61 @@ def game_to_json(game, user):
     return game_json
 
 
+# Serializes a page of games, annotating the user's likes, dislikes, reviews
+# and wishes with a single query for the whole page
+def games_to_json(games, user):
+    games = list(games)
+    flags = games_user_flags(user, [game.id for game in games])
+
+    return [game_to_json(game, user, flags[game.id]) for game in games]
+
+
+# Fetches, in a single query, which of the given games the user has liked,
+# disliked, reviewed or wished
+def games_user_flags(user, game_ids):
+    flags = defaultdict(set)
+
+    if not user or type(user) == AnonymousUser:
+        return flags
+
+    recomendations = Recomendation.objects \
+        .filter(user=user, game_id__in=game_ids) \
+        .annotate(kind=Case(
+            When(recomends=True, then=Value('like')),
+            default=Value('dislike'),
+            output_field=CharField())) \
+        .values_list('game_id', 'kind')
+
+    reviews = Review.objects \
+        .filter(user=user, game_id__in=game_ids) \
+        .annotate(kind=Value('review', output_field=CharField())) \
+        .values_list('game_id', 'kind')
+
+    wishes = Wishlist.objects \
+        .filter(user=user, game_id__in=game_ids) \
+        .annotate(kind=Value('wish', output_field=CharField())) \
+        .values_list('game_id', 'kind')
+
+    for game_id, kind in recomendations.union(reviews, wishes, all=True):
+        flags[game_id].add(kind)
+
+    return flags
+
+
+def game_json_apply_user_flags(game_json, game_flags):
+    recomends = None
+    if 'like' in game_flags:
+        recomends = True
+    elif 'dislike' in game_flags:
+        recomends = False
+
+    game_json['recomends'] = recomends
+    game_json['has_review'] = 'review' in game_flags
+    game_json['has_wish'] = 'wish' in game_flags
+
+    return game_json
+
+
 def games_all_base_query(user=None, country='US'):
     query = games_all_base_query_no_user(country)
 
@@ -139,6 +202,33 @@ def games_all_base_query(user=None, country='US'):
 
 
 def games_all_base_query_no_user(country):
+    # Countries without a summary fall back to the aggregate query
+    if country not in SwitchGameSummary.COUNTRIES:
+        return games_all_aggregate_query(country)
+
+    query = SwitchGame.objects \
+        .filter(hide=False) \
+        .annotate(summary=FilteredRelation(
+            'summaries', condition=Q(summaries__country=country))) \
+        .filter(summary__isnull=False) \
+        .annotate(game_title=F('summary__title')) \
+        .annotate(game_image=F('summary__image')) \
+        .annotate(release_us=F('summary__release_us')) \
+        .annotate(release_eu=F('summary__release_eu')) \
+        .annotate(likes=F('summary__likes')) \
+        .annotate(dislikes=F('summary__dislikes')) \
+        .annotate(reviews=F('summary__reviews')) \
+        .annotate(tags=F('summary__tags')) \
+        .annotate(vote_sum=F('likes') - F('dislikes')) \
+        .annotate(price_value=F('summary__price_value')) \
+        .annotate(sales_value=F('summary__sales_value')) \
+        .annotate(current_price=F('summary__current_price')) \
+        .annotate(discount_percent=F('summary__discount_percent'))
+
+    return query
+
+
+def games_all_aggregate_query(country):
     price_subquery = SwitchGamePrice.objects \
         .filter(game=OuterRef('pk'), country=country)
 
@@ -1,7 +1,10 @@
 import json
+from hashlib import md5
 from random import randint
+from uuid import uuid4
 
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
 from django.db.models import Count, OuterRef, Exists
 from django.db.models.functions import Least
 from django.shortcuts import get_object_or_404
@@ -11,12 +14,20 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 
-from games.api.game import games_all_base_query, game_to_json
+from games.api.game import (
+    games_all_base_query,
+    games_user_flags,
+    game_json_apply_user_flags,
+    game_to_json,
+)
 from games.api.queries import search_query
 from games.models import SwitchGameList, SwitchGameListSlot
 from games.serializers import SwitchGameListSerializer
 
 
+GAME_LISTS_CACHE_VERSION_KEY = 'game_lists_version'
+GAME_LISTS_CACHE_TIMEOUT = 60 * 60
+
 # SLOTS
 @api_view(['GET'])
 @permission_classes((IsAuthenticated, IsAdminUser))
@@ -64,6 +75,7 @@ def list_slot_delete(request, id):
 
     try:
         instance.delete()
+        invalidate_game_lists_cache()
         for slot_after in slots_after:
             slot_after.order = slot_after.order - 1
             slot_after.save()
@@ -132,6 +144,7 @@ def list_post(request, slot_id):
     if success:
         try:
             new_list.save()
+            invalidate_game_lists_cache()
             return Response(status=status.HTTP_200_OK)
         except Exception as e:
             return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -171,6 +184,7 @@ def game_list_update(request, list_id):
     if success:
         try:
             list_serialized.save()
+            invalidate_game_lists_cache()
             return Response(status=status.HTTP_200_OK)
         except Exception as e:
             print(e)
@@ -184,6 +198,7 @@ def game_list_delete(request, list_id):
 
     try:
         list_instance.delete()
+        invalidate_game_lists_cache()
         return Response(status=status.HTTP_200_OK)
     except Exception as e:
         return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -227,7 +242,8 @@ def game_lists_results(request):
         lists = lists.filter(logged_list=False)
 
     for game_list in lists:
-        slot_dict[game_list.slot.id]['lists'].append({
+        slot_dict[game_list.slot_id]['lists'].append({
+            'id': game_list.id,
             'title': game_list.title,
             'query_json': game_list.query_json,
             'frequency': game_list.frequency
@@ -248,29 +264,23 @@ def game_lists_results(request):
 
             if random_int <= 0:
                 slot['title'] = game_list['title']
+                slot['id'] = game_list['id']
                 slot['json'] = game_list['query_json']
                 slot.pop('lists')
                 break
 
-    for slot in slots:
-        list_json = json.loads(slot['json'])
-        slot.pop('json')
+    # (game id, game json) of every slot, to annotate user info on all of
+    # them at once
+    slots_games = []
 
-        tags = list_json['tags'].split(',') if 'tags' in list_json else None
-        order_by = list_json['order_by'] if 'order_by' in list_json else '-game_title'
-
-        released_status = list_json['released_status'] if 'released_status' in list_json else None
-        date_from = list_json['date_from'] if 'date_from' in list_json else None
-        date_to = list_json['date_to'] if 'date_to' in list_json else None
+    for slot in slots:
+        list_id = slot.pop('id')
+        query_json = slot.pop('json')
+        list_json = json.loads(query_json)
 
         price_from = list_json['price_from'] if 'price_from' in list_json else None
         price_to = list_json['price_to'] if 'price_to' in list_json else None
-        sales_only = list_json['sales_only'] if 'sales_only' in list_json else None
-        min_discount = list_json['min_discount'] if 'min_discount' in list_json else None
-
-        highlights_only = list_json['highlights_only'] if 'highlights_only' in list_json else None
         unrated_only = list_json['unrated_only'] if 'unrated_only' in list_json else None
-        quantity = list_json['qtd'] if 'qtd' in list_json else 20
 
         # Changes price from/ to in countries with "bigger" currencies
         if price_from:
@@ -287,32 +297,94 @@ def game_lists_results(request):
                 currencyFormat(price_to, country)
             )
 
+        # Lists with only unrated games depend on the user, so they're never
+        # cached
+        if unrated_only:
+            games = game_list_query(
+                list_json, price_from, price_to, request.user, country)
 
-        games = search_query(
-            user=request.user,
-            search_text=None,
-            tags=tags,
-            order_by=order_by,
-            released_status=released_status,
-            date_from=date_from,
-            date_to=date_to,
-            price_from=price_from,
-            price_to=price_to,
-            sales_only=sales_only,
-            min_discount=min_discount,
-            highlights_only=highlights_only,
-            unrated_only=unrated_only,
-            quantity=quantity,
-            offset=0,
-            country=country,
-        )
-
-        for game in games:
-            slot['games'].append(game_to_json(game, request.user))
+        else:
+            cache_key = game_list_cache_key(list_id, query_json, country)
+            games = cache.get(cache_key)
+
+            if games is None:
+                games = game_list_query(
+                    list_json, price_from, price_to, None, country)
+                cache.set(cache_key, games, GAME_LISTS_CACHE_TIMEOUT)
+
+        slot['games'] = [game_json for game_id, game_json in games]
+        slots_games.extend(games)
+
+    # Annotates user likes, dislikes, reviews and wishes
+    if type(user) != AnonymousUser:
+        flags = games_user_flags(
+            user, [game_id for game_id, game_json in slots_games])
+
+        for game_id, game_json in slots_games:
+            game_json_apply_user_flags(game_json, flags[game_id])
 
     return Response(slots, status=status.HTTP_200_OK)
 
 
+# Returns a list of (game id, anonymous game json) tuples
+def game_list_query(list_json, price_from, price_to, user, country):
+    tags = list_json['tags'].split(',') if 'tags' in list_json else None
+    order_by = list_json['order_by'] if 'order_by' in list_json else '-game_title'
+
+    released_status = list_json['released_status'] if 'released_status' in list_json else None
+    date_from = list_json['date_from'] if 'date_from' in list_json else None
+    date_to = list_json['date_to'] if 'date_to' in list_json else None
+
+    sales_only = list_json['sales_only'] if 'sales_only' in list_json else None
+    min_discount = list_json['min_discount'] if 'min_discount' in list_json else None
+
+    highlights_only = list_json['highlights_only'] if 'highlights_only' in list_json else None
+    unrated_only = list_json['unrated_only'] if 'unrated_only' in list_json else None
+    quantity = list_json['qtd'] if 'qtd' in list_json else 20
+
+    games = search_query(
+        user=user,
+        search_text=None,
+        tags=tags,
+        order_by=order_by,
+        released_status=released_status,
+        date_from=date_from,
+        date_to=date_to,
+        price_from=price_from,
+        price_to=price_to,
+        sales_only=sales_only,
+        min_discount=min_discount,
+        highlights_only=highlights_only,
+        unrated_only=unrated_only,
+        quantity=quantity,
+        offset=0,
+        country=country,
+    )
+
+    return [(game.id, game_to_json(game, None)) for game in games]
+
+
+# CACHE
+# Cached lists are keyed by a version, which is changed whenever lists are
+# edited or prices are updated, invalidating every cached list at once
+def game_list_cache_key(list_id, query_json, country):
+    version = cache.get(GAME_LISTS_CACHE_VERSION_KEY)
+    if version is None:
+        cache.add(GAME_LISTS_CACHE_VERSION_KEY, uuid4().hex, None)
+        version = cache.get(GAME_LISTS_CACHE_VERSION_KEY)
+
+    return 'game_list:{}:{}:{}:{}'.format(
+        version,
+        list_id,
+        country,
+        md5(query_json.encode()).hexdigest(),
+    )
+
+
+def invalidate_game_lists_cache():
+    cache.set(GAME_LISTS_CACHE_VERSION_KEY, uuid4().hex, None)
+
+
 def currencyMultiplier(value, country):
     if country == 'MX':
         return float(value) * 25
@@ -0,0 +1,107 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+
+
+CURSOR_DEFAULT_QUANTITY = 20
+
+
+# Cursors are opaque to the clients: a base64 encoded JSON object holding the
+# sort values of the last item of the previous page ('last') and whatever
+# else the endpoint needs to resume the listing (e.g. a randomly chosen tag).
+# An empty cursor means the first page
+def decode_cursor(cursor):
+    if not cursor:
+        return {}
+
+    try:
+        state = json.loads(urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+    if type(state) != dict:
+        raise ValueError('Invalid cursor')
+
+    return state
+
+
+def encode_cursor(state):
+    return urlsafe_b64encode(
+        json.dumps(state, cls=CursorJSONEncoder).encode()).decode()
+
+
+class CursorJSONEncoder(DjangoJSONEncoder):
+    # Keeps the datetimes' microseconds, which DjangoJSONEncoder drops, so
+    # they still match the database values
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+
+        return super().default(o)
+
+
+# Returns a (page, next cursor) tuple. 'keys' are the fields the query is
+# sorted by, with a '-' prefix for descending order, and must end with an
+# unique field (e.g. 'id'), so no item is skipped or repeated between pages.
+# Instead of skipping the previous pages' rows, the query starts right after
+# the last item sent, so every page costs the same as the first one
+def paginate_by_cursor(query, keys, state, quantity=None, extra=None):
+    quantity = quantity or CURSOR_DEFAULT_QUANTITY
+
+    fields = [(key.lstrip('-'), key.startswith('-')) for key in keys]
+
+    # Nulls always come last, whatever the direction
+    query = query.order_by(*[
+        F(field).desc(nulls_last=True) if descending else
+        F(field).asc(nulls_last=True)
+        for field, descending in fields
+    ])
+
+    last = state.get('last')
+    if last is not None:
+        if type(last) != list or len(last) != len(fields):
+            raise ValueError('Invalid cursor')
+
+        try:
+            query = query.filter(cursor_after_filter(fields, last))
+        except (TypeError, ValidationError):
+            raise ValueError('Invalid cursor')
+
+    page = list(query[:quantity + 1])
+
+    next_cursor = None
+    if len(page) > quantity:
+        page = page[:quantity]
+
+        next_state = dict(extra or {})
+        next_state['last'] = [
+            getattr(page[-1], field) for field, descending in fields]
+        next_cursor = encode_cursor(next_state)
+
+    return page, next_cursor
+
+
+# Filters the items sorted after the given values, e.g. for the keys
+# ('-a', 'id'): a < last_a OR a IS NULL OR (a = last_a AND id > last_id)
+def cursor_after_filter(fields, values):
+    after = Q(pk__in=[])
+    equal = Q()
+
+    for (field, descending), value in zip(fields, values):
+        if value is None:
+            # Nothing but other nulls come after a null
+            equal = equal & Q(**{field + '__isnull': True})
+            continue
+
+        lookup = '__lt' if descending else '__gt'
+        after = after | (equal & (
+            Q(**{field + lookup: value}) |
+            Q(**{field + '__isnull': True})))
+
+        equal = equal & Q(**{field: value})
+
+    return after
@@ -1,13 +1,25 @@
+from django.core.exceptions import ValidationError
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
 
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 
-from games.models import SwitchGamePrice, SwitchGameSale, SwitchGame
+from games.models import (
+    SwitchGame,
+    SwitchGamePrice,
+    SwitchGamePriceEvent,
+    SwitchGamePriceHistory,
+    SwitchGamePriceRun,
+    SwitchGameSale,
+)
 from games.serializers import SwitchGameMediaSerializer
 
 
+PRICE_EVENTS_PAGE_SIZE = 100
+
+
 @api_view(['GET'])
 def all_price_game_code(request, game_code):
     game = get_object_or_404(SwitchGame, game_code_unique=game_code)
@@ -28,3 +40,132 @@ def all_price_game_code(request, game_code):
             response[sale.country]['sale_to'] = sale.end_datetime
 
     return Response(response, status=status.HTTP_200_OK)
+
+
+# Runs of days with the same prices, by country, optionally limited to a
+# country and to the runs overlapping the 'from' to 'to' dates
+@api_view(['GET'])
+def price_history_game_code(request, game_code):
+    game = get_object_or_404(SwitchGame, game_code_unique=game_code)
+
+    country = request.query_params.get('country')
+    date_from = request.query_params.get('from')
+    date_to = request.query_params.get('to')
+
+    history = SwitchGamePriceHistory.objects \
+        .filter(game=game) \
+        .order_by('country', 'start_date')
+
+    if country:
+        history = history.filter(country=country.upper())
+
+    try:
+        if date_from:
+            history = history.filter(end_date__gte=date_from)
+
+        if date_to:
+            history = history.filter(start_date__lte=date_to)
+    except ValidationError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+    response = {}
+    for run in history:
+        if run.country not in response:
+            response[run.country] = []
+
+        response[run.country].append({
+            'currency': run.currency,
+            'price': run.price_value,
+            'sale_price': run.sales_value,
+            'from': run.start_date,
+            'to': run.end_date,
+        })
+
+    return Response(response, status=status.HTTP_200_OK)
+
+
+# Lowest price ever seen in each country, and the last run of days with it
+@api_view(['GET'])
+def lowest_price_game_code(request, game_code):
+    game = get_object_or_404(SwitchGame, game_code_unique=game_code)
+
+    lowest = SwitchGamePriceHistory.objects \
+        .filter(game=game) \
+        .annotate(value=Coalesce('sales_value', 'price_value')) \
+        .order_by('country', 'value', '-start_date') \
+        .distinct('country')
+
+    response = {}
+    for run in lowest:
+        response[run.country] = {
+            'currency': run.currency,
+            'price': run.value,
+            'from': run.start_date,
+            'to': run.end_date,
+        }
+
+    return Response(response, status=status.HTTP_200_OK)
+
+
+# Price events after the given id, oldest first, optionally of a single
+# country or kind. Clients follow the feed by sending the last id received.
+# Only events of finished price updates are listed, as the ones of an update
+# still running may be committed out of order
+@api_view(['GET'])
+def price_events(request):
+    try:
+        after = int(request.query_params.get('after', 0))
+    except ValueError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+    country = request.query_params.get('country')
+    kind = request.query_params.get('kind')
+
+    last_run = SwitchGamePriceRun.objects.order_by('-id').first()
+    last_event_id = last_run.last_event_id if last_run else 0
+
+    events = SwitchGamePriceEvent.objects \
+        .filter(id__gt=after, id__lte=last_event_id) \
+        .order_by('id')
+
+    if country:
+        events = events.filter(country=country.upper())
+
+    if kind:
+        events = events.filter(kind=kind.upper())
+
+    events = list(events.values(
+        'id',
+        'game_id',
+        'game__game_code_unique',
+        'country',
+        'kind',
+        'currency',
+        'old_value',
+        'new_value',
+        'date',
+    )[:PRICE_EVENTS_PAGE_SIZE])
+
+    # Unless the page is full, every event up to the last run's was scanned,
+    # so filtered clients move past the ones that didn't match
+    if len(events) == PRICE_EVENTS_PAGE_SIZE:
+        last = events[-1]['id']
+    else:
+        last = max(after, last_event_id)
+
+    response = {
+        'events': [{
+            'id': event['id'],
+            'game_id': event['game_id'],
+            'game_code': event['game__game_code_unique'],
+            'country': event['country'],
+            'kind': event['kind'],
+            'currency': event['currency'],
+            'old_price': event['old_value'],
+            'new_price': event['new_value'],
+            'date': event['date'],
+        } for event in events],
+        'last': last,
+    }
+
+    return Response(response, status=status.HTTP_200_OK)
@@ -5,10 +5,9 @@ from random import randint
 from re import split
 
 from django.contrib.auth.models import AnonymousUser
-from django.contrib.postgres.search import (
-    SearchQuery, SearchRank, SearchVector)
-from django.db.models import Count, Q, F
-from django.db.models.functions import Least, Greatest
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import Count, Q, F, FloatField
+from django.db.models.functions import Cast, Least, Greatest
 from django.shortcuts import get_object_or_404
 from django.utils.timezone import now
 
@@ -21,10 +20,11 @@ from games.models import SwitchGame
 from games.api.game import (
     games_all_base_query,
     games_all_base_query_no_user,
-    games_apply_user_query,
-    game_to_json
+    games_to_json,
 )
+from games.api.pagination import decode_cursor, paginate_by_cursor
 
+from classification.api.alike import alike_votes
 from classification.models import (
     ConfirmedAlike,
     ConfirmedHighlight,
@@ -56,6 +56,7 @@ def games_get(request):
     unrated_only = request.query_params.get('unrated_only', None)
 
     country = request.query_params.get('country', 'US')
+    cursor = request.query_params.get('cursor', None)
 
     if quantity:
         quantity = int(quantity)
@@ -66,7 +67,12 @@ def games_get(request):
     if tags:
         tags = tags.split(',')
 
-    msg = []
+    if cursor is not None:
+        try:
+            cursor = decode_cursor(cursor)
+        except ValueError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
     games = search_query(
         user=request.user,
         search_text=search_text,
@@ -84,10 +90,28 @@ def games_get(request):
         quantity=quantity,
         offset=offset,
         country=country,
+        cursor=cursor,
     )
 
-    for game in games:
-        msg.append(game_to_json(game, request.user))
+    # Cursor pagination, sent back along the games
+    if cursor is not None:
+        try:
+            games, next_cursor = paginate_by_cursor(
+                games,
+                search_query_ordering(order_by, search_text) + ['id'],
+                cursor,
+                quantity)
+        except ValueError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        msg = {
+            'games': games_to_json(games, request.user),
+            'next_cursor': next_cursor,
+        }
+
+        return Response(msg, status=status.HTTP_200_OK)
+
+    msg = games_to_json(games, request.user)
 
     return Response(msg, status=status.HTTP_200_OK)
 
@@ -116,24 +140,23 @@ def games_get_alike_to_recomended(request):
 
     alike_query = ConfirmedAlike.objects \
         .filter(game1_id=random_game_id) \
-        .annotate(votes=Count('game2__suggested_alike_game2',
-                              filter=Q(game1_id=random_game_id))) \
+        .annotate(votes=alike_votes(random_game_id, 'game2_id')) \
         .order_by('-votes') \
         .values('game2_id')
 
     games_ids = map(lambda x: x['game2_id'], alike_query)
 
-    games_query = games_all_base_query(request.user, country) \
+    games_query = games_all_base_query_no_user(country) \
         .filter(id__in=games_ids)
 
     games_list = []
-    for game in games_query:
+    for game_json in games_to_json(games_query, request.user):
         # If game already in games_list list, skip it
         if len(games_list) and \
-                games_list[-1]['game_code'] == game.game_code_unique:
+                games_list[-1]['game_code'] == game_json['game_code']:
             continue
 
-        games_list.append(game_to_json(game, request.user))
+        games_list.append(game_json)
 
     response = {'game_title': chosen_game_title, 'games': games_list}
 
@@ -146,12 +169,19 @@ def games_get_recomended_following(request):
     quantity = request.query_params.get('qtd', None)
     offset = request.query_params.get('offset', 0)
     country = request.query_params.get('country', 'US')
+    cursor = request.query_params.get('cursor', None)
 
     if quantity:
         quantity = int(quantity)
     if offset:
         offset = int(offset)
 
+    if cursor is not None:
+        try:
+            cursor = decode_cursor(cursor)
+        except ValueError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
     following = map(lambda x: x['followed_id'],
                     request.user.follower.values('followed_id'))
 
@@ -166,16 +196,29 @@ def games_get_recomended_following(request):
                      .filter(recomends=True)
                      .values('game_id'))
 
-    games = games_all_base_query(request.user, country) \
+    games = games_all_base_query_no_user(country) \
         .filter(id__in=game_ids) \
-        .distinct() \
-        .order_by('-vote_sum')[
-            offset: offset + quantity if quantity else None
-        ]
+        .distinct()
 
-    response = []
-    for game in games:
-        response.append(game_to_json(game, request.user))
+    if cursor is not None:
+        try:
+            games, next_cursor = paginate_by_cursor(
+                games, ['-vote_sum', 'id'], cursor, quantity)
+        except ValueError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        response = {
+            'games': games_to_json(games, request.user),
+            'next_cursor': next_cursor,
+        }
+
+        return Response(response, status=status.HTTP_200_OK)
+
+    games = games.order_by('-vote_sum')[
+        offset: offset + quantity if quantity else None
+    ]
+
+    response = games_to_json(games, request.user)
 
     return Response(response, status=status.HTTP_200_OK)
 
@@ -186,28 +229,44 @@ def games_get_liked_tag(request):
     quantity = request.query_params.get('qtd', None)
     offset = request.query_params.get('offset', 0)
     country = request.query_params.get('country', 'US')
+    cursor = request.query_params.get('cursor', None)
 
     if quantity:
         quantity = int(quantity)
     if offset:
         offset = int(offset)
 
-    # Randomly choose a tag from a liked game
-    liked_games_ids = map(
-        lambda x: x['game_id'],
-        Recomendation.objects
-                     .filter(recomends=True, user=request.user)
-                     .values('game_id'))
+    if cursor is not None:
+        try:
+            cursor = decode_cursor(cursor)
+        except ValueError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
 
-    liked_tags = list(ConfirmedTag.objects.filter(game_id__in=liked_games_ids)
-                                          .values('tag_id', 'tag__name')
-                                          .order_by('tag_id'))
+    # Next pages keep the tag chosen for the first one
+    if cursor and 'tag' in cursor:
+        if type(cursor['tag']) != int:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
 
-    if len(liked_tags) == 0:
-        return Response(status=status.HTTP_404_NOT_FOUND)
+        random_tag_id = cursor['tag']
+
+    else:
+        # Randomly choose a tag from a liked game
+        liked_games_ids = map(
+            lambda x: x['game_id'],
+            Recomendation.objects
+                         .filter(recomends=True, user=request.user)
+                         .values('game_id'))
+
+        liked_tags = list(ConfirmedTag.objects
+                                      .filter(game_id__in=liked_games_ids)
+                                      .values('tag_id', 'tag__name')
+                                      .order_by('tag_id'))
 
-    random_index = randint(0, len(liked_tags) - 1)
-    random_tag_id = liked_tags[random_index]['tag_id']
+        if len(liked_tags) == 0:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        random_index = randint(0, len(liked_tags) - 1)
+        random_tag_id = liked_tags[random_index]['tag_id']
 
     # Return the best ranked games from the chosen tag
     games_ids = map(
@@ -217,18 +276,34 @@ def games_get_liked_tag(request):
     today = now()
     date_lowerbound = today + timedelta(days=-8 * 30)
 
-    games_query = games_all_base_query(request.user, country) \
+    tag = get_object_or_404(Tag, id=random_tag_id)
+
+    games_query = games_all_base_query_no_user(country) \
         .filter(id__in=games_ids) \
         .annotate(release_date=Greatest('release_us', 'release_eu')) \
-        .filter(release_date__gte=date_lowerbound) \
+        .filter(release_date__gte=date_lowerbound)
+
+    if cursor is not None:
+        try:
+            games, next_cursor = paginate_by_cursor(
+                games_query, ['-vote_sum', 'id'], cursor, quantity,
+                extra={'tag': random_tag_id})
+        except ValueError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        response = {
+            'tag': tag.name,
+            'games': games_to_json(games, request.user),
+            'next_cursor': next_cursor}
+
+        return Response(response, status=status.HTTP_200_OK)
+
+    games_query = games_query \
         .order_by('-vote_sum')[offset: offset + quantity if quantity else None]
 
     response = {
-        'tag': Tag.objects.get(id=random_tag_id).name,
-        'games': []}
-
-    for game in games_query:
-        response['games'].append(game_to_json(game, request.user))
+        'tag': tag.name,
+        'games': games_to_json(games_query, request.user)}
 
     return Response(response, status=status.HTTP_200_OK)
 
@@ -238,31 +313,46 @@ def games_get_random_tag(request):
     quantity = request.query_params.get('qtd', None)
     offset = request.query_params.get('offset', 0)
     country = request.query_params.get('country', 'US')
+    cursor = request.query_params.get('cursor', None)
 
     if quantity:
         quantity = int(quantity)
     if offset:
         offset = int(offset)
 
-    # Randomly choose a tag with a minimum of 4 games
-    tags = Tag.objects \
-        .annotate(
-            games=Count(
-                'confirmedtag__game',
-                filter=Q(confirmedtag__game__hide=False),
-                distinct=True
-            )
-        ) \
-        .filter(games__gte=16) \
-        .values('id', 'games')
-
-    all_tags_ids = [x['id'] for x in tags]
-
-    if len(all_tags_ids) == 0:
-        return Response(status=status.HTTP_404_NOT_FOUND)
+    if cursor is not None:
+        try:
+            cursor = decode_cursor(cursor)
+        except ValueError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+    # Next pages keep the tag chosen for the first one
+    if cursor and 'tag' in cursor:
+        if type(cursor['tag']) != int:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        random_tag_id = cursor['tag']
 
-    random_index = randint(0, len(all_tags_ids) - 1)
-    random_tag_id = all_tags_ids[random_index]
+    else:
+        # Randomly choose a tag with a minimum of 4 games
+        tags = Tag.objects \
+            .annotate(
+                games=Count(
+                    'confirmedtag__game',
+                    filter=Q(confirmedtag__game__hide=False),
+                    distinct=True
+                )
+            ) \
+            .filter(games__gte=16) \
+            .values('id', 'games')
+
+        all_tags_ids = [x['id'] for x in tags]
+
+        if len(all_tags_ids) == 0:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+
+        random_index = randint(0, len(all_tags_ids) - 1)
+        random_tag_id = all_tags_ids[random_index]
 
     # Return the best ranked games from the chosen tag
     games_ids = map(
@@ -272,19 +362,34 @@ def games_get_random_tag(request):
     today = now()
     date_lowerbound = today + timedelta(days=-8 * 30)
 
-    games_query = games_all_base_query(request.user, country) \
+    tag = get_object_or_404(Tag, id=random_tag_id)
+
+    games_query = games_all_base_query_no_user(country) \
         .filter(id__in=games_ids) \
         .annotate(release_date=Greatest('release_us', 'release_eu')) \
-        .filter(release_date__gte=date_lowerbound) \
-        .order_by('-vote_sum')[
-            offset: offset + quantity if quantity else None]
+        .filter(release_date__gte=date_lowerbound)
 
-    response = {
-        'tag': Tag.objects.get(id=random_tag_id).name,
-        'games': []}
+    if cursor is not None:
+        try:
+            games, next_cursor = paginate_by_cursor(
+                games_query, ['-vote_sum', 'id'], cursor, quantity,
+                extra={'tag': random_tag_id})
+        except ValueError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
 
-    for game in games_query:
-        response['games'].append(game_to_json(game, request.user))
+        response = {
+            'tag': tag.name,
+            'games': games_to_json(games, request.user),
+            'next_cursor': next_cursor}
+
+        return Response(response, status=status.HTTP_200_OK)
+
+    games_query = games_query \
+        .order_by('-vote_sum')[offset: offset + quantity if quantity else None]
+
+    response = {
+        'tag': tag.name,
+        'games': games_to_json(games_query, request.user)}
 
     return Response(response, status=status.HTTP_200_OK)
 
@@ -306,6 +411,7 @@ def search_query(
     quantity=None,
     offset=0,
     country='US',
+    cursor=None,
 ):
 
     games = games_all_base_query_no_user(country)
@@ -341,31 +447,37 @@ def search_query(
             games = games.filter(date__lte=date_to)
 
     # TAGS
+    # Filter through subqueries, since joining the confirmed tags/ highlights
+    # brings duplicates now that the base query isn't aggregated
     if tags:
         for tag in tags:
-            games = games.filter(confirmedtag__tag_id=tag)
+            games = games.filter(id__in=ConfirmedTag.objects
+                                 .filter(tag_id=tag)
+                                 .values('game_id'))
 
     # HIGHLIGHTS ONLY
     if highlights_only:
-        games = games.filter(confirmedhighlight__isnull=False)
+        games = games.filter(id__in=ConfirmedHighlight.objects
+                             .values('game_id'))
 
     # SEARCH TEXT
     if search_text:
         terms = [SearchQuery(term) for term in split(r'\W+', search_text)]
-        vector = SearchVector('game_title')
         query = reduce(or_, terms)
 
+        # Matching goes through the search vector's index, so the rank is
+        # only computed for the matched games. It's cast from a real to a
+        # double precision, as cursors hold it as a double, which wouldn't
+        # be equal to the real when compared
         games = games \
-            .annotate(rank=SearchRank(vector, query)) \
+            .filter(search_vector=query) \
+            .annotate(rank=Cast(
+                SearchRank(F('search_vector'), query), FloatField())) \
             .filter(rank__gte=0.02)
 
     # SEARCH ORDER
     if order_by:
-        # If the search_text is empty there's no 'rank' annotated
-        if not (order_by == '-rank' and not search_text):
-            games = games.order_by(order_by, 'game_title')
-        else:
-            games = games.order_by('game_title')
+        games = games.order_by(*search_query_ordering(order_by, search_text))
 
         # If ordering by price, exclude games without price
         if order_by == 'current_price' or order_by == '-current_price':
@@ -374,17 +486,29 @@ def search_query(
         if order_by == 'discount_percent' or order_by == '-discount_percent':
             games = games.filter(discount_percent__isnull=False)
 
-    # ANNOTATES USER LIKES, DISLIKES, REVIEWS AND WISHES
-    games = games_apply_user_query(games, user)
-
-    # ONLY GAMES ALREADY RATED BY THE USER
+    # ONLY GAMES NOT RATED BY THE USER
+    # User likes, dislikes, reviews and wishes aren't annotated here, they're
+    # applied over the resulting page by 'games_to_json'
     if unrated_only:
         if user and type(user) != AnonymousUser:
-            games = games \
-                .exclude(has_liked=True) \
-                .exclude(has_disliked=True)
+            games = games.exclude(id__in=Recomendation.objects
+                                  .filter(user=user)
+                                  .values('game_id'))
 
     # PAGINATION
-    games = games[offset: offset + quantity if quantity else None]
+    # Paginated by the caller when using cursors
+    if cursor is None:
+        games = games[offset: offset + quantity if quantity else None]
 
     return games
+
+
+def search_query_ordering(order_by, search_text=None):
+    if not order_by:
+        return ['game_title']
+
+    # If the search_text is empty there's no 'rank' annotated
+    if order_by == '-rank' and not search_text:
+        return ['game_title']
+
+    return [order_by, 'game_title']
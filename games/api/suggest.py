@@ -0,0 +1,165 @@
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from threading import Lock
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.db.models.functions import Coalesce
+
+from rest_framework import status
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from games.models import SwitchGame
+
+
+TITLE_INDEX_VERSION_KEY = 'games_title_index_version'
+SUGGEST_DEFAULT_QUANTITY = 10
+SUGGEST_MAX_QUANTITY = 50
+
+
+@api_view(['GET'])
+def games_suggest(request):
+    text = request.query_params.get('text', '')
+    quantity = request.query_params.get('qtd', SUGGEST_DEFAULT_QUANTITY)
+
+    try:
+        quantity = int(quantity)
+    except ValueError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+    quantity = max(1, min(quantity, SUGGEST_MAX_QUANTITY))
+
+    response = map(lambda game: {
+        'id': game[0],
+        'game_code': game[1],
+        'title': game[2],
+    },
+        get_title_index().suggest(text, quantity))
+
+    return Response(response, status=status.HTTP_200_OK)
+
+
+class TitleIndex:
+    TRIGRAM_MIN_SIMILARITY = 0.5
+
+    def __init__(self, games):
+        # Each game is a (id, game_code, title) tuple
+        self.games = []
+
+        # Sorted (normalized text, game position) pairs, for the whole titles
+        # and for the titles starting at each of their words
+        self.title_keys = []
+        self.word_keys = []
+
+        self.trigrams = defaultdict(set)
+
+        for game in games:
+            position = len(self.games)
+            self.games.append(game)
+
+            title = normalize_title(game[2])
+            words = title.split(' ')
+
+            self.title_keys.append((title, position))
+            for i in range(1, len(words)):
+                self.word_keys.append((' '.join(words[i:]), position))
+
+            for trigram in title_trigrams(title):
+                self.trigrams[trigram].add(position)
+
+        self.title_keys.sort()
+        self.word_keys.sort()
+
+    def suggest(self, text, quantity):
+        text = normalize_title(text)
+        if not text:
+            return []
+
+        # Titles starting with the text come first, then titles with a word
+        # starting with it
+        found = []
+        for keys in [self.title_keys, self.word_keys]:
+            i = bisect_left(keys, (text, -1))
+
+            while (
+                i < len(keys) and
+                keys[i][0].startswith(text) and
+                len(found) < quantity
+            ):
+                if keys[i][1] not in found:
+                    found.append(keys[i][1])
+                i = i + 1
+
+        # If nothing starts with the text (e.g. a typo), fall back to the
+        # titles with the most trigrams in common
+        if len(found) == 0:
+            text_trigrams = title_trigrams(text)
+            shared = defaultdict(int)
+
+            for trigram in text_trigrams:
+                for position in self.trigrams.get(trigram, ()):
+                    shared[position] = shared[position] + 1
+
+            similar = sorted(
+                (
+                    (-count / len(text_trigrams), position)
+                    for position, count in shared.items()
+                    if count / len(text_trigrams) >=
+                    self.TRIGRAM_MIN_SIMILARITY
+                ),
+            )
+
+            found = [position for _, position in similar[:quantity]]
+
+        return [self.games[position] for position in found]
+
+
+def normalize_title(title):
+    title = unicodedata.normalize('NFKD', title or '')
+    title = ''.join(c for c in title if not unicodedata.combining(c))
+    title = re.sub(r'\W+', ' ', title.lower())
+
+    return title.strip()
+
+
+def title_trigrams(title):
+    padded = '  {} '.format(title)
+    return set(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+# The index is kept in memory by each process, and rebuilt whenever the
+# version stored in the cache changes
+_title_index = None
+_title_index_version = None
+_title_index_lock = Lock()
+
+
+def get_title_index():
+    global _title_index, _title_index_version
+
+    version = cache.get(TITLE_INDEX_VERSION_KEY)
+    if version is None:
+        cache.add(TITLE_INDEX_VERSION_KEY, uuid4().hex, None)
+        version = cache.get(TITLE_INDEX_VERSION_KEY)
+
+    if _title_index is None or version != _title_index_version:
+        with _title_index_lock:
+            if _title_index is None or version != _title_index_version:
+                games = SwitchGame.objects \
+                    .filter(hide=False) \
+                    .annotate(game_title=Coalesce(
+                        'game_eu__title', 'game_us__title')) \
+                    .order_by('game_title') \
+                    .values_list('id', 'game_code_unique', 'game_title')
+
+                _title_index = TitleIndex(games)
+                _title_index_version = version
+
+    return _title_index
+
+
+def invalidate_title_index():
+    cache.set(TITLE_INDEX_VERSION_KEY, uuid4().hex, None)
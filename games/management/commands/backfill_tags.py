@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from games.tasks import backfill_tags
+
+
+class Command(BaseCommand):
+    help = 'Runs tag extractors over the last crawled catalog snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('region', choices=['us', 'eu'])
+        parser.add_argument('extractors', nargs='+')
+        parser.add_argument(
+            '--refresh',
+            action='store_true',
+            help='Crawl the catalog again instead of using its snapshot')
+
+    def handle(self, *args, **options):
+        backfill_tags(
+            options['region'], options['extractors'], options['refresh'])
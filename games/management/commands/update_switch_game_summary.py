@@ -0,0 +1,8 @@
+from django.core.management.base import BaseCommand
+
+from games.tasks import update_switch_game_summary
+
+
+class Command(BaseCommand):
+    def handle(self, *args, **options):
+        update_switch_game_summary()
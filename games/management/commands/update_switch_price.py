@@ -1,8 +1,24 @@
 from django.core.management.base import BaseCommand
 
-from games.tasks import update_switch_price
+from games.tasks import update_switch_price, update_switch_price_local
 
 
 class Command(BaseCommand):
+    help = 'Updates the prices of every Switch game'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Only update the chunks that failed in the last run')
+        parser.add_argument(
+            '--queue',
+            action='store_true',
+            help='Queue the chunks to the workers, instead of updating them '
+                 'in this process')
+
     def handle(self, *args, **options):
-        update_switch_price()
+        if options['queue']:
+            update_switch_price(options['resume'])
+        else:
+            update_switch_price_local(options['resume'])
@@ -0,0 +1,38 @@
+# Generated by Django 2.1 on 2026-10-18 12:02
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0003_auto_20190130_0204'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SwitchGameSummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country', models.CharField(max_length=2)),
+                ('title', models.CharField(max_length=256)),
+                ('image', models.CharField(blank=True, max_length=256, null=True)),
+                ('release_us', models.DateField(blank=True, null=True)),
+                ('release_eu', models.DateField(blank=True, null=True)),
+                ('likes', models.IntegerField(default=0)),
+                ('dislikes', models.IntegerField(default=0)),
+                ('reviews', models.IntegerField(default=0)),
+                ('tags', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(blank=True, max_length=128, null=True), default=list, size=None)),
+                ('price_value', models.FloatField(blank=True, null=True)),
+                ('sales_value', models.FloatField(blank=True, null=True)),
+                ('current_price', models.FloatField(blank=True, null=True)),
+                ('discount_percent', models.FloatField(blank=True, null=True)),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summaries', to='games.SwitchGame')),
+            ],
+            options={
+                'unique_together': {('game', 'country')},
+            },
+        ),
+    ]
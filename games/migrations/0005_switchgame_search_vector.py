@@ -0,0 +1,41 @@
+# Generated by Django 2.1 on 2026-10-18 12:04
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0004_switchgamesummary'),
+        ('classification', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='switchgame',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='switchgame',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='games_switc_search__29438e_gin'),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE games_switchgame g SET search_vector =
+                setweight(to_tsvector(
+                    COALESCE((SELECT title FROM games_switchgameeu
+                              WHERE id = g.game_eu_id), '') || ' ' ||
+                    COALESCE((SELECT title FROM games_switchgameus
+                              WHERE id = g.game_us_id), '')), 'A') ||
+                setweight(to_tsvector(
+                    COALESCE((SELECT string_agg(DISTINCT t.name, ' ')
+                              FROM classification_confirmedtag ct
+                              JOIN classification_tag t ON t.id = ct.tag_id
+                              WHERE ct.game_id = g.id), '')), 'D');
+            """,
+            migrations.RunSQL.noop,
+        ),
+    ]
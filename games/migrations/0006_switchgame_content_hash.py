@@ -0,0 +1,23 @@
+# Generated by Django 2.1 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0005_switchgame_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='switchgameeu',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=40, null=True),
+        ),
+        migrations.AddField(
+            model_name='switchgameus',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=40, null=True),
+        ),
+    ]
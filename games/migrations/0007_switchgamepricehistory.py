@@ -0,0 +1,30 @@
+# Generated by Django 2.1 on 2026-10-18 12:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0006_switchgame_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SwitchGamePriceHistory',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country', models.CharField(max_length=2)),
+                ('currency', models.CharField(max_length=8)),
+                ('price_value', models.FloatField()),
+                ('sales_value', models.FloatField(blank=True, null=True)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='games.SwitchGame')),
+            ],
+            options={
+                'unique_together': {('game', 'country', 'start_date')},
+            },
+        ),
+    ]
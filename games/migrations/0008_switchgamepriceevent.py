@@ -0,0 +1,27 @@
+# Generated by Django 2.1 on 2026-10-18 12:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0007_switchgamepricehistory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SwitchGamePriceEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country', models.CharField(max_length=2)),
+                ('kind', models.CharField(choices=[('SS', 'Sale started'), ('SE', 'Sale ended'), ('PC', 'Price changed')], max_length=2)),
+                ('currency', models.CharField(max_length=8)),
+                ('old_value', models.FloatField(blank=True, null=True)),
+                ('new_value', models.FloatField()),
+                ('date', models.DateTimeField(auto_now_add=True)),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='games.SwitchGame')),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.1 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+# Events saved so far were all committed
+def add_price_run(apps, schema_editor):
+    SwitchGamePriceEvent = apps.get_model('games', 'SwitchGamePriceEvent')
+    SwitchGamePriceRun = apps.get_model('games', 'SwitchGamePriceRun')
+
+    SwitchGamePriceRun.objects.create(
+        last_event_id=SwitchGamePriceEvent.objects
+        .aggregate(models.Max('id'))['id__max'] or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0008_switchgamepriceevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SwitchGamePriceRun',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_event_id', models.IntegerField(default=0)),
+                ('date', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.RunPython(add_price_run, migrations.RunPython.noop),
+    ]
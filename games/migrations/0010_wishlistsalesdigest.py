@@ -0,0 +1,35 @@
+# Generated by Django 2.1 on 2026-10-18 12:40
+
+from django.db import migrations, models
+
+
+# Starts from the events already listed, as their digests were sent before
+def add_wishlist_sales_digest(apps, schema_editor):
+    SwitchGamePriceRun = apps.get_model('games', 'SwitchGamePriceRun')
+    WishlistSalesDigest = apps.get_model('games', 'WishlistSalesDigest')
+
+    last_run = SwitchGamePriceRun.objects.order_by('-id').first()
+
+    WishlistSalesDigest.objects.create(
+        last_event_id=last_run.last_event_id if last_run else 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0009_switchgamepricerun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WishlistSalesDigest',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_event_id', models.IntegerField(default=0)),
+                ('next_event_id', models.IntegerField(blank=True, null=True)),
+                ('last_user_id', models.IntegerField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(
+            add_wishlist_sales_digest, migrations.RunPython.noop),
+    ]
@@ -6,3 +6,4 @@ from .switch_game import *
 from .home_lists import *
 from .media import *
 from .price import *
+from .summary import *
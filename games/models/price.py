@@ -28,3 +28,75 @@ class SwitchGameSale(models.Model):
 
     class Meta:
         unique_together = ('game', 'country')
+
+
+# Prices of a game in a country over time. Each row is a run of days with the
+# same price and sale value, from 'start_date' to the last day they were
+# seen ('end_date'), so a new row is only added when either of them changes
+class SwitchGamePriceHistory(models.Model):
+    game = models.ForeignKey(SwitchGame, on_delete=models.CASCADE)
+    country = models.CharField(max_length=2)
+
+    currency = models.CharField(max_length=8)
+    price_value = models.FloatField()
+    sales_value = models.FloatField(null=True, blank=True)
+
+    start_date = models.DateField()
+    end_date = models.DateField()
+
+    class Meta:
+        unique_together = ('game', 'country', 'start_date')
+
+
+# Changes of a game's current price in a country, found by the price crawler,
+# for other parts of the site to follow by id instead of scanning the prices
+class SwitchGamePriceEvent(models.Model):
+    SALE_STARTED = 'SS'
+    SALE_ENDED = 'SE'
+    PRICE_CHANGED = 'PC'
+
+    KIND_CHOICES = (
+        (SALE_STARTED, 'Sale started'),
+        (SALE_ENDED, 'Sale ended'),
+        (PRICE_CHANGED, 'Price changed'),
+    )
+
+    game = models.ForeignKey(SwitchGame, on_delete=models.CASCADE)
+    country = models.CharField(max_length=2)
+    kind = models.CharField(max_length=2, choices=KIND_CHOICES)
+
+    currency = models.CharField(max_length=8)
+    old_value = models.FloatField(null=True, blank=True)
+    new_value = models.FloatField()
+
+    date = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return '[{}] {} {}: {} -> {}'.format(
+            self.country, self.game, self.get_kind_display(),
+            self.old_value, self.new_value)
+
+
+# Price updates that finished, with the newest event found by then. Chunks
+# save their events concurrently, so an event can be committed after one
+# with a higher id, but none is left uncommitted once the update finished.
+# Readers only go up to the last run's event, so they never skip one
+class SwitchGamePriceRun(models.Model):
+    last_event_id = models.IntegerField(default=0)
+
+    date = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return 'Price update at {}, up to event {}' \
+            .format(self.date, self.last_event_id)
+
+
+# Progress of the wishlist sales digests: users were notified of the events
+# up to 'last_event_id'. While digests are being sent, the ones of the users
+# up to 'last_user_id' were also sent for the events up to 'next_event_id',
+# so a digest that failed midway resumes from there
+class WishlistSalesDigest(models.Model):
+    last_event_id = models.IntegerField(default=0)
+
+    next_event_id = models.IntegerField(null=True, blank=True)
+    last_user_id = models.IntegerField(null=True, blank=True)
@@ -0,0 +1,43 @@
+from django.contrib.postgres.fields import ArrayField
+from django.db import models
+
+from games.models import SwitchGame
+
+
+class SwitchGameSummary(models.Model):
+    # Countries with prices fetched by the crawler
+    COUNTRIES = ['US', 'CA', 'MX', 'GB', 'DE', 'FR', 'ZA', 'RU']
+
+    game = models.ForeignKey(
+        SwitchGame,
+        on_delete=models.CASCADE,
+        related_name='summaries',
+    )
+    country = models.CharField(max_length=2)
+
+    # Game Info
+    title = models.CharField(max_length=256)
+    image = models.CharField(max_length=256, null=True, blank=True)
+    release_us = models.DateField(null=True, blank=True)
+    release_eu = models.DateField(null=True, blank=True)
+
+    # Classification
+    likes = models.IntegerField(default=0)
+    dislikes = models.IntegerField(default=0)
+    reviews = models.IntegerField(default=0)
+    tags = ArrayField(
+        models.CharField(max_length=128, null=True, blank=True),
+        default=list,
+    )
+
+    # Price
+    price_value = models.FloatField(null=True, blank=True)
+    sales_value = models.FloatField(null=True, blank=True)
+    current_price = models.FloatField(null=True, blank=True)
+    discount_percent = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('game', 'country')
+
+    def __str__(self):
+        return '[{}] {} summary'.format(self.country, self.game)
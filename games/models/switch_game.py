@@ -1,3 +1,5 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
 from . import SwitchGameUS, SwitchGameEU
@@ -21,6 +23,12 @@ class SwitchGame(models.Model):
     game_code_unique = models.CharField(max_length=5, unique=True)
     hide = models.BooleanField(default=False)
 
+    # Titles and tag names, kept up to date by 'update_search_vector'
+    search_vector = SearchVectorField(null=True, blank=True)
+
+    class Meta:
+        indexes = [GinIndex(fields=['search_vector'])]
+
     @property
     def title(self):
         return self.game_eu.title if self.game_eu else self.game_us.title
@@ -26,6 +26,9 @@ class SwitchGameEU(models.Model):
     image_sq_url = models.CharField(max_length=256)
     image_sq_h2_url = models.CharField(max_length=256)
 
+    # Fingerprint of the upstream record, to skip unchanged games when syncing
+    content_hash = models.CharField(max_length=40, null=True, blank=True)
+
     @property
     def game_code(self):
         return (
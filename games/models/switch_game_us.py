@@ -17,6 +17,9 @@ class SwitchGameUS(models.Model):
     front_box_art = models.URLField()
     video_link = models.CharField(max_length=32, null=True, blank=True)
 
+    # Fingerprint of the upstream record, to skip unchanged games when syncing
+    content_hash = models.CharField(max_length=40, null=True, blank=True)
+
     @property
     def game_code(self):
         return (
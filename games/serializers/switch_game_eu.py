@@ -58,7 +58,7 @@ class SwitchGameEUSerializer(serializers.Serializer):
 
     def update(self, instance, validated_data):
         release_datetime = datetime.strptime(
-            validated_data.get('date_from')[:10], '%Y-%M-%d')
+            validated_data.get('date_from')[:10], '%Y-%m-%d')
         nsuid = (
             validated_data.get('nsuid_txt')[0]
             if validated_data.get('nsuid_txt') is not None
@@ -69,13 +69,16 @@ class SwitchGameEUSerializer(serializers.Serializer):
         instance.url = validated_data.get('url', instance.url)
         instance.release_date = release_datetime
         instance.description = validated_data.get(
-            'excerpt', instance.description),
+            'excerpt', instance.description)
 
         instance.nsuid = nsuid
-        instance.game_code = validated_data.get(
-            'product_code_txt', instance.game_code)
         instance.fs_id = validated_data.get('fs_id', instance.fs_id)
 
+        product_code = validated_data.get('product_code_txt')[0]
+        instance.game_code_system = product_code[0:3]
+        instance.game_code_region = product_code[3:4]
+        instance.game_code_unique = product_code.strip()[4:9]
+
         instance.image_carousel_url = validated_data.get(
             'gift_finder_carousel_image_url_s',
             instance.image_carousel_url
@@ -93,6 +96,11 @@ class SwitchGameEUSerializer(serializers.Serializer):
             'image_url', instance.image_url)
         instance.image_sq_url = validated_data.get(
             'image_url_sq_s', instance.image_sq_url)
+        instance.image_sq_h2_url = validated_data.get(
+            'image_url_h2x1_s', instance.image_sq_h2_url)
+
+        instance.content_hash = self.context.get(
+            'content_hash', instance.content_hash)
 
         instance.save()
         return instance
@@ -130,6 +138,8 @@ class SwitchGameEUSerializer(serializers.Serializer):
             image_url=validated_data.get('image_url'),
             image_sq_url=validated_data.get('image_url_sq_s'),
             image_sq_h2_url=validated_data.get('image_url_h2x1_s'),
+
+            content_hash=self.context.get('content_hash'),
         )
 
         return switch_game_eu
@@ -61,12 +61,12 @@ class SwitchGameUSSerializer(serializers.Serializer):
         release_datetime = datetime.strptime(
             validated_data.get('release_date'), '%b %d, %Y')
         clean_game_code = re.sub(
-            r'[a-zA-Z0-9]+', '',
+            r'[\-\. ]+', '',
             validated_data.get('game_code', instance.game_code)
         )
 
         instance.title = validated_data.get('title', instance.title)
-        instance.slug = validated_data.get('slug', instance.slug)
+        instance.slug = validated_data.get('slug', instance.slug)[0:50]
         instance.release_date = release_datetime
 
         instance.nsuid = validated_data.get('nsuid', instance.nsuid)
@@ -80,6 +80,9 @@ class SwitchGameUSSerializer(serializers.Serializer):
         instance.video_link = validated_data.get(
             'video_link', instance.video_link)
 
+        instance.content_hash = self.context.get(
+            'content_hash', instance.content_hash)
+
         instance.save()
         return instance
 
@@ -102,6 +105,8 @@ class SwitchGameUSSerializer(serializers.Serializer):
 
             front_box_art=validated_data.get('front_box_art'),
             video_link=validated_data.get('video_link'),
+
+            content_hash=self.context.get('content_hash'),
         )
 
         return switch_game_us
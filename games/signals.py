@@ -0,0 +1,67 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from classification.models import ConfirmedTag, Recomendation, Review
+from games.models import (
+    SwitchGame,
+    SwitchGameUS,
+    SwitchGameEU,
+    SwitchGamePrice,
+    SwitchGameSale,
+)
+from games.api.suggest import invalidate_title_index
+from games.tasks.update_search import update_search_vector
+from games.tasks.update_summary import (
+    refresh_game_summary,
+    refresh_game_summary_counters,
+    refresh_game_summary_prices,
+)
+
+
+# Keep the games' summary, search vector and title index up to date
+@receiver(post_save, sender=SwitchGame)
+def switch_game_changed(sender, instance, **kwargs):
+    refresh_game_summary([instance.id])
+    update_search_vector([instance.id])
+    invalidate_title_index()
+
+
+@receiver(post_delete, sender=SwitchGame)
+def switch_game_deleted(sender, instance, **kwargs):
+    invalidate_title_index()
+
+
+@receiver(post_save, sender=SwitchGameUS)
+@receiver(post_save, sender=SwitchGameEU)
+def switch_game_region_changed(sender, instance, **kwargs):
+    if sender == SwitchGameUS:
+        games = SwitchGame.objects.filter(game_us=instance)
+    else:
+        games = SwitchGame.objects.filter(game_eu=instance)
+
+    game_ids = list(games.values_list('id', flat=True))
+    if len(game_ids):
+        refresh_game_summary(game_ids)
+        update_search_vector(game_ids)
+        invalidate_title_index()
+
+
+@receiver(post_save, sender=Recomendation)
+@receiver(post_delete, sender=Recomendation)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(post_save, sender=ConfirmedTag)
+@receiver(post_delete, sender=ConfirmedTag)
+def classification_changed(sender, instance, **kwargs):
+    refresh_game_summary_counters(instance.game_id)
+
+    if sender == ConfirmedTag:
+        update_search_vector([instance.game_id])
+
+
+@receiver(post_save, sender=SwitchGamePrice)
+@receiver(post_delete, sender=SwitchGamePrice)
+@receiver(post_save, sender=SwitchGameSale)
+@receiver(post_delete, sender=SwitchGameSale)
+def price_changed(sender, instance, **kwargs):
+    refresh_game_summary_prices(instance.game_id, instance.country)
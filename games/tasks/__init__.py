@@ -1,4 +1,7 @@
+from .pipeline import *
 from .update_switch_us import *
 from .update_switch_eu import *
 
 from .update_switch_price import *
+from .notify_wishlist_sales import *
+from .update_summary import *
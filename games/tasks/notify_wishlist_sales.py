@@ -0,0 +1,111 @@
+from itertools import groupby
+
+from celery import shared_task
+
+from django.core.mail import get_connection
+
+from classification.models import Wishlist
+from games.models import (
+    SwitchGamePriceEvent,
+    SwitchGamePriceRun,
+    WishlistSalesDigest,
+)
+from users.emails import WishlistSalesEmail
+from eshop_crawler.settings import (
+    EMAIL_HOST_USER,
+    WEBSITE_URL,
+    WISHLIST_SALES_COUNTRY,
+    WISHLIST_SALES_EMAIL_BATCH,
+)
+
+
+# Emails each user a digest of their wished games whose sales started since
+# the last run (and are still on). Every wish to notify comes from a single
+# query, sorted by user, and the emails are queued in batches. The progress
+# is saved after each batch, so a run that failed midway is resumed by the
+# next one, without emailing the same users again
+@shared_task()
+def notify_wishlist_sales():
+    print('Sending wishlist sales digests...')
+
+    country = WISHLIST_SALES_COUNTRY
+
+    digest, digest_created = WishlistSalesDigest.objects.get_or_create(id=1)
+
+    # Events up to the last finished price update, so the ones created while
+    # this runs are left for the next run
+    if digest.next_event_id is None:
+        last_run = SwitchGamePriceRun.objects.order_by('-id').first()
+
+        digest.next_event_id = last_run.last_event_id if last_run else 0
+        digest.last_user_id = 0
+        digest.save()
+
+    wishes = Wishlist.objects \
+        .filter(
+            game__switchgamepriceevent__id__gt=digest.last_event_id,
+            game__switchgamepriceevent__id__lte=digest.next_event_id,
+            game__switchgamepriceevent__kind=SwitchGamePriceEvent.SALE_STARTED,
+            game__switchgamepriceevent__country=country,
+            game__switchgamesale__country=country,
+            game__summaries__country=country,
+            user__is_active=True,
+            user_id__gt=digest.last_user_id,
+        ) \
+        .order_by('user_id', 'game__summaries__title') \
+        .values_list(
+            'user_id',
+            'user__email',
+            'user__first_name',
+            'game__summaries__title',
+            'game__switchgamesale__amount',
+            'game__switchgamesale__end_datetime',
+            'game__summaries__discount_percent',
+        ) \
+        .distinct()
+
+    email = WishlistSalesEmail()
+    connection = get_connection()
+
+    batch = []
+    users = 0
+
+    for (user_id, user_email, user_first_name), games in groupby(
+        wishes.iterator(), lambda wish: wish[:3]
+    ):
+        context = {
+            'url': WEBSITE_URL,
+            'user_first_name': user_first_name,
+            'games': [{
+                'title': title,
+                'price': amount,
+                'until': end_datetime,
+                'discount': round((discount_percent or 0) * 100),
+            } for _, _, _, title, amount, end_datetime, discount_percent
+                in games],
+        }
+
+        batch.append(email.make_email_object(
+            user_email, context, from_email=EMAIL_HOST_USER))
+        users = users + 1
+
+        if len(batch) == WISHLIST_SALES_EMAIL_BATCH:
+            send_wishlist_sales_batch(connection, batch, digest, user_id)
+            batch = []
+
+    if len(batch):
+        send_wishlist_sales_batch(connection, batch, digest, user_id)
+
+    digest.last_event_id = digest.next_event_id
+    digest.next_event_id = None
+    digest.last_user_id = None
+    digest.save()
+
+    print('Sent wishlist sales digests to {} users.'.format(users))
+
+
+def send_wishlist_sales_batch(connection, batch, digest, last_user_id):
+    connection.send_messages(batch)
+
+    digest.last_user_id = last_user_id
+    digest.save(update_fields=['last_user_id'])
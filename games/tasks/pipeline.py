@@ -0,0 +1,293 @@
+import gzip
+import json
+import os
+import re
+
+from celery import shared_task
+
+from classification.models.tag import TagGroup
+from games.models import SwitchGameUS, SwitchGameEU
+from games.tasks.update_utils import (
+    print_request_metrics,
+    treated_request,
+    TagResolver,
+)
+from eshop_crawler.settings import SNAPSHOT_DIR
+
+
+# Catalog crawl pipeline:
+# fetch (catalog generators, saved to a snapshot while crawled) ->
+# parse (game codes, resolved to the games in the database) ->
+# enrich (tag extractors) -> sink (tag resolver, flushed in batch)
+
+
+US_GAMES_URL = 'http://www.nintendo.com/json/content/get/filter/game'
+EU_GAMES_URL = 'http://search.nintendo-europe.com/en/select'
+EU_GAMES_PAGE_SIZE = 200
+
+
+# FETCH
+# Raised by a catalog once it yielded every game it could, if some of them
+# couldn't be requested
+class IncompleteCatalog(Exception):
+    pass
+
+
+def us_catalog():
+    params = {
+        'system': 'switch',
+        'sort': 'title',
+        'direction': 'asc',
+        'limit': 200,
+        'offset': 0
+    }
+
+    failed_offsets = []
+
+    for offset in range(0, 3000, 200):
+        # Make the request, and skip current offset if there's any problem
+        params['offset'] = offset
+        req = treated_request(US_GAMES_URL, params, 'US Switch games')
+        if req is None:
+            print('Request for us games failed at offset {}, skipping.'
+                  .format(offset))
+            failed_offsets.append(offset)
+            continue
+
+        games = req.json()['games']
+
+        # If offset went beyond the last game, stop
+        if 'game' not in games:
+            break
+
+        print('{} games found at offset {}'
+              .format(len(games['game']), offset))
+
+        for game in games['game']:
+            yield game
+
+    if len(failed_offsets):
+        raise IncompleteCatalog(
+            'us games at offsets {}'.format(failed_offsets))
+
+
+# Pages through the EU catalog, yielding its games one at a time, so only
+# a single page of it is held in memory
+def eu_catalog():
+    params = {
+        'fq': 'type:GAME AND system_type:nintendoswitch* AND product_code_txt:*',
+        'q': '*',
+        'rows': EU_GAMES_PAGE_SIZE,
+        'sort': 'sorting_title asc',
+        'start': 0,
+        'wt': 'json',
+    }
+
+    found = None
+
+    while found is None or params['start'] < found:
+        # Make the request, and stop if there's any problem
+        req = treated_request(EU_GAMES_URL, params, 'EU Switch games')
+        if req is None:
+            print('Request for eu games failed at offset {}, aborting.'
+                  .format(params['start']))
+            raise IncompleteCatalog(
+                'eu games at offset {}'.format(params['start']))
+
+        response = req.json()['response']
+
+        if found is None:
+            found = response['numFound']
+            print('{} games found'.format(found))
+
+        if len(response['docs']) == 0:
+            return
+
+        params['start'] = params['start'] + len(response['docs'])
+
+        for game in response['docs']:
+            yield game
+
+
+# SNAPSHOTS
+# Catalogs are saved as gzipped JSON lines, one game per line, so backfills
+# can run over the last crawl instead of downloading it again
+def snapshot_path(region):
+    return os.path.join(SNAPSHOT_DIR, '{}_catalog.jsonl.gz'.format(region))
+
+
+# Saves the games to the region's snapshot while yielding them. The snapshot
+# is only replaced once the whole catalog went through, otherwise the last
+# one is kept
+def save_snapshot(region, games):
+    path = snapshot_path(region)
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+
+    try:
+        with gzip.open(path + '.tmp', 'wt') as snapshot:
+            for game in games:
+                snapshot.write(json.dumps(game) + '\n')
+                yield game
+
+    except IncompleteCatalog as e:
+        print('Incomplete catalog ({}), keeping the last {} snapshot.'
+              .format(e, region.upper()))
+        os.remove(path + '.tmp')
+        return
+
+    except BaseException:
+        os.remove(path + '.tmp')
+        raise
+
+    os.replace(path + '.tmp', path)
+
+
+def read_snapshot(region):
+    with gzip.open(snapshot_path(region), 'rt') as snapshot:
+        for line in snapshot:
+            yield json.loads(line)
+
+
+# Games of the region's snapshot, crawling the catalog first if there's no
+# snapshot yet or 'refresh' is set
+def catalog(region, refresh=False):
+    if refresh or not os.path.exists(snapshot_path(region)):
+        return save_snapshot(region, CATALOGS[region]())
+
+    print('Reading {} catalog snapshot...'.format(region.upper()))
+    return read_snapshot(region)
+
+
+# PARSE
+def us_game_code(game):
+    return re.sub(r'[\-\. ]+', '', game['game_code'])[4:9]
+
+
+def eu_game_code(game):
+    return game['product_code_txt'][0].strip()[4:9]
+
+
+# ENRICH
+# Extractors return the (tag name, tag group name) pairs of an upstream game
+def us_free_to_play(game):
+    if game.get('free_to_start') == 'true':
+        return [('Free to Play', 'Characteristics')]
+    return []
+
+
+def us_genres(game):
+    categories = game['categories']['category']
+
+    # Games with a single category have it as a string, instead of an array
+    if isinstance(categories, str):
+        categories = [categories]
+
+    return [(category, 'Genre') for category in categories]
+
+
+def eu_developer(game):
+    if 'developer' in game:
+        return [(game['developer'], 'Developer')]
+    return []
+
+
+def eu_publisher(game):
+    if 'publisher' in game:
+        return [(game['publisher'], 'Publisher')]
+    return []
+
+
+def eu_age_rating(game):
+    if game.get('age_rating_sorting_i', 0) != 0:
+        return [('PEGI ' + str(game['age_rating_sorting_i']), 'Age Rating')]
+    return []
+
+
+def eu_physical_release(game):
+    if game.get('physical_version_b') == True:
+        return [('Physical Release', 'Characteristics')]
+    return []
+
+
+CATALOGS = {
+    'us': us_catalog,
+    'eu': eu_catalog,
+}
+
+GAME_CODES = {
+    'us': (SwitchGameUS, us_game_code),
+    'eu': (SwitchGameEU, eu_game_code),
+}
+
+EXTRACTORS = {
+    'us': {
+        'free_to_play': us_free_to_play,
+        'genre': us_genres,
+    },
+    'eu': {
+        'developer': eu_developer,
+        'publisher': eu_publisher,
+        'age_rating': eu_age_rating,
+        'physical_release': eu_physical_release,
+    },
+}
+
+
+# SINK
+# Runs the region's extractors over upstream games, gathering their tags in
+# a tag resolver, which saves them all at once when flushed
+class TagEnricher:
+    def __init__(self, region, extractor_names=None):
+        if extractor_names is None:
+            extractor_names = EXTRACTORS[region].keys()
+
+        self.extractors = [
+            EXTRACTORS[region][name] for name in extractor_names]
+
+        self.tag_groups = {}
+        self.tag_resolver = TagResolver()
+
+    def enrich(self, game, game_id):
+        for extractor in self.extractors:
+            for tag_name, tag_group_name in extractor(game):
+                self.tag_resolver.add(
+                    tag_name, self.tag_group_id(tag_group_name), game_id)
+
+    def tag_group_id(self, name):
+        if name not in self.tag_groups:
+            tag_group, tag_group_created = \
+                TagGroup.objects.get_or_create(name=name)
+            self.tag_groups[name] = tag_group.id
+
+        return self.tag_groups[name]
+
+    def flush(self):
+        self.tag_resolver.flush()
+
+
+# Runs the given extractors, in a single pass, over every game of the
+# region's catalog that's already in the database
+@shared_task()
+def backfill_tags(region, extractor_names, refresh=False):
+    print('Backfilling {} tags {}...'.format(
+        region.upper(), ', '.join(extractor_names)))
+
+    model, game_code = GAME_CODES[region]
+
+    # Ids of every game already in the database, by code
+    game_ids = dict(
+        model.objects
+        .filter(switchgame__isnull=False)
+        .values_list('game_code_unique', 'switchgame__id')
+    )
+
+    tag_enricher = TagEnricher(region, extractor_names)
+
+    for game in catalog(region, refresh):
+        code = game_code(game)
+
+        if code in game_ids:
+            tag_enricher.enrich(game, game_ids[code])
+
+    tag_enricher.flush()
+    print_request_metrics()
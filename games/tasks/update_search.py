@@ -0,0 +1,33 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db.models import OuterRef, Subquery
+
+from classification.models import ConfirmedTag
+from games.models import SwitchGame, SwitchGameUS, SwitchGameEU
+
+
+# Stores the EU/ US titles (weight A) and tag names (weight D) of the given
+# games (or of every game, if no ids are given) on their search vector
+def update_search_vector(game_ids=None):
+    title_eu = SwitchGameEU.objects \
+        .filter(id=OuterRef('game_eu')) \
+        .values('title')
+
+    title_us = SwitchGameUS.objects \
+        .filter(id=OuterRef('game_us')) \
+        .values('title')
+
+    tag_names = ConfirmedTag.objects \
+        .filter(game=OuterRef('pk')) \
+        .values('game') \
+        .annotate(names=StringAgg('tag__name', ' ', distinct=True)) \
+        .values('names')
+
+    games = SwitchGame.objects.all()
+    if game_ids is not None:
+        games = games.filter(id__in=game_ids)
+
+    games.update(search_vector=(
+        SearchVector(Subquery(title_eu), Subquery(title_us), weight='A') +
+        SearchVector(Subquery(tag_names), weight='D')
+    ))
@@ -0,0 +1,129 @@
+from celery import shared_task
+
+from django.db import transaction
+
+from games.api.game import games_all_aggregate_query
+from games.api.home_lists import invalidate_game_lists_cache
+from games.models import SwitchGamePrice, SwitchGameSale, SwitchGameSummary
+from eshop_crawler.db import bulk_upsert
+
+
+SUMMARY_UPDATE_FIELDS = [
+    'title', 'image', 'release_us', 'release_eu',
+    'likes', 'dislikes', 'reviews', 'tags',
+    'price_value', 'sales_value', 'current_price', 'discount_percent',
+]
+
+
+@shared_task()
+def update_switch_game_summary():
+    print('Rebuilding Switch games\' summary...')
+
+    refresh_game_summary()
+    invalidate_game_lists_cache()
+
+    print('Finished rebuilding Switch games\' summary.')
+
+
+# Rebuilds the summary of the given games (or of every game, if no ids are
+# given) from the aggregate query. Rows are upserted, and only the ones of
+# games no longer summarized are deleted, so refreshes of the same games
+# can run at once
+def refresh_game_summary(game_ids=None, countries=None):
+    if countries is None:
+        countries = SwitchGameSummary.COUNTRIES
+
+    for country in countries:
+        games = games_all_aggregate_query(country)
+        summaries = SwitchGameSummary.objects.filter(country=country)
+
+        if game_ids is not None:
+            games = games.filter(id__in=game_ids)
+            summaries = summaries.filter(game_id__in=game_ids)
+
+        # Sorted, so refreshes at once lock the rows in the same order
+        new_summaries = [
+            SwitchGameSummary(
+                game_id=game.id,
+                country=country,
+
+                title=game.game_title,
+                image=game.game_image,
+                release_us=game.release_us,
+                release_eu=game.release_eu,
+
+                likes=game.likes,
+                dislikes=game.dislikes,
+                reviews=game.reviews,
+                tags=game.tags,
+
+                price_value=game.price_value,
+                sales_value=game.sales_value,
+                current_price=game.current_price,
+                discount_percent=game.discount_percent,
+            )
+            for game in games.order_by('id')
+        ]
+
+        with transaction.atomic():
+            bulk_upsert(
+                SwitchGameSummary,
+                new_summaries,
+                ['game', 'country'],
+                SUMMARY_UPDATE_FIELDS)
+
+            summaries \
+                .exclude(game_id__in=[
+                    summary.game_id for summary in new_summaries]) \
+                .delete()
+
+
+# Updates likes, dislikes, reviews and tags of an already summarized game.
+# Never creates rows, so it's safe to call while the game is being deleted
+def refresh_game_summary_counters(game_id):
+    counters = games_all_aggregate_query('US') \
+        .filter(id=game_id) \
+        .values('likes', 'dislikes', 'reviews', 'tags')
+
+    if len(counters) == 0:
+        return
+
+    SwitchGameSummary.objects \
+        .filter(game_id=game_id) \
+        .update(**counters[0])
+
+
+# Updates the price fields of an already summarized game
+def refresh_game_summary_prices(game_id, country):
+    price_value = SwitchGamePrice.objects \
+        .filter(game_id=game_id, country=country) \
+        .values_list('raw_value', flat=True) \
+        .first()
+
+    sales_value = SwitchGameSale.objects \
+        .filter(game_id=game_id, country=country) \
+        .values_list('raw_value', flat=True) \
+        .first()
+
+    SwitchGameSummary.objects \
+        .filter(game_id=game_id, country=country) \
+        .update(**summary_prices(price_value, sales_value))
+
+
+def summary_prices(price_value, sales_value):
+    # Same rules as the 'current_price' and 'discount_percent' annotations
+    current_price = sales_value if sales_value is not None else price_value
+
+    if price_value is None or current_price is None:
+        discount_percent = None
+    elif price_value == 0:
+        discount_percent = 0
+    else:
+        discount_percent = (price_value - current_price) / price_value
+
+    return {
+        'price_value': price_value,
+        'sales_value': sales_value,
+        'current_price': current_price,
+        'discount_percent': discount_percent,
+    }
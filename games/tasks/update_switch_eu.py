@@ -1,134 +1,96 @@
 from celery import shared_task
 
-from requests.exceptions import Timeout, ConnectionError
-import requests
-
-from classification.models.tag import TagGroup
 from games.models import SwitchGameEU
 from games.serializers import SwitchGameEUSerializer
-from games.tasks.update_utils import treated_request, create_tag_if_not_exists
+from games.tasks.pipeline import (
+    backfill_tags,
+    save_snapshot,
+    eu_catalog,
+    eu_game_code,
+    TagEnricher,
+)
+from games.tasks.update_search import update_search_vector
+from games.tasks.update_utils import print_request_metrics, record_hash
 
 
-@shared_task()
-def update_switch_eu():
-    print('Updating Switch EU games...')
-
-    url = 'http://search.nintendo-europe.com/en/select'
-    params = {
-        'fq': 'type:GAME AND system_type:nintendoswitch* AND product_code_txt:*',
-        'q': '*',
-        'rows': 9999,
-        'sort': 'sorting_title asc',
-        'start': 0,
-        'wt': 'json',
-    }
+# Fields of the upstream records that are saved, either in the game itself
+# or as its tags
+EU_HASHED_FIELDS = list(SwitchGameEUSerializer._declared_fields.keys()) + \
+    ['developer', 'publisher', 'age_rating_sorting_i', 'physical_version_b']
 
-    # Make the request, and stop the task if there's any problem
-    req = treated_request(url, params, 'EU Switch games')
-    if req is None:
-        return
 
-    tag_group_publisher, tag_group_pub_created = \
-        TagGroup.objects.get_or_create(name='Publisher')
+# Only games created or changed upstream since the last run are saved,
+# unless 'full' is set
+@shared_task()
+def update_switch_eu(full=False):
+    print('Updating Switch EU games...')
 
-    tag_group_developer, tag_group_dev_created = \
-        TagGroup.objects.get_or_create(name='Developer')
+    tag_enricher = TagEnricher('eu')
 
-    tag_group_age, tag_group_age_created = \
-        TagGroup.objects.get_or_create(name='Age Rating')
+    # Ids and fingerprints of every game already in the database, by code
+    known_games = {
+        game_code: (game_id, content_hash)
+        for game_id, game_code, content_hash in SwitchGameEU.objects
+        .values_list('id', 'game_code_unique', 'content_hash')
+    }
 
-    tag_group_characteristics, tag_group_created = \
-        TagGroup.objects.get_or_create(name='Characteristics')
+    created = 0
+    updated = 0
 
-    # Add every game to the database
-    print('{} games found'.format(len(req.json()['response']['docs'])))
+    # Add every new or changed game to the database
+    for game in save_snapshot('eu', eu_catalog()):
+        game_code = eu_game_code(game)
+        content_hash = record_hash(game, EU_HASHED_FIELDS)
+        known_game = known_games.get(game_code)
 
-    for game in req.json()['response']['docs']:
-        if SwitchGameEU.objects.filter(
-                game_code_unique=game['product_code_txt'][0].strip()[4:9]).exists():
+        # If game already in DB and unchanged, skip it
+        if known_game and known_game[1] == content_hash and not full:
             continue
 
-        serializer = SwitchGameEUSerializer(data=game)
+        # If game already in DB, update it
+        elif known_game:
+            serializer = SwitchGameEUSerializer(
+                SwitchGameEU.objects.get(id=known_game[0]),
+                data=game,
+                context={'content_hash': content_hash})
+
+        # If game not yet in DB, save it
+        else:
+            serializer = SwitchGameEUSerializer(
+                data=game,
+                context={'content_hash': content_hash})
 
         if serializer.is_valid():
-            # print('Added: {}'.format(game['title']))
             switch_game_eu = serializer.save()
 
-            # If game has a publisher defined, add it as a tag
-            if 'developer' in game:
-                create_tag_if_not_exists(
-                    game['developer'],
-                    tag_group_developer,
-                    switch_game_eu.switchgame)
-
-            # If game has a publisher defined, add it as a tag
-            if 'publisher' in game:
-                create_tag_if_not_exists(
-                    game['publisher'],
-                    tag_group_publisher,
-                    switch_game_eu.switchgame)
-
-            # If game has an age rating defined, add it as a tag
-            if 'age_rating_sorting_i' in game and game['age_rating_sorting_i'] != 0:
-                create_tag_if_not_exists(
-                    'PEGI ' + str(game['age_rating_sorting_i']),
-                    tag_group_age,
-                    switch_game_eu.switchgame)
-
-            # If game has physical version set to true
-            if 'physical_version_b' in game and game['physical_version_b'] == True:
-                create_tag_if_not_exists(
-                    'Physical Release',
-                    tag_group_characteristics,
-                    switch_game_eu.switchgame)
+            if known_game:
+                updated = updated + 1
+            else:
+                created = created + 1
+
+            known_games[game_code] = (switch_game_eu.id, content_hash)
+
+            # Assign the game's developer, publisher, age rating and
+            # physical release as tags, unless it isn't linked to a game
+            # (e.g. the game was deleted)
+            if hasattr(switch_game_eu, 'switchgame'):
+                tag_enricher.enrich(game, switch_game_eu.switchgame.id)
         else:
             print('[ERROR] ({}): {}'.format(game['title'], serializer.errors))
 
+    print('{} EU games created and {} updated'.format(created, updated))
+    print_request_metrics()
+
+    tag_enricher.flush()
+    update_search_vector()
+
 
 # One off task made to update the production database
 @shared_task()
 def update_switch_eu_age_tag():
     print('Updating Switch EU games age rating...')
 
-    url = 'http://search.nintendo-europe.com/en/select'
-    params = {
-        'fq': 'type:GAME AND system_type:nintendoswitch* AND product_code_txt:*',
-        'q': '*',
-        'rows': 9999,
-        'sort': 'sorting_title asc',
-        'start': 0,
-        'wt': 'json',
-    }
-
-    # Make the request, and stop the task if there's any problem
-    req = treated_request(url, params, 'EU Switch games')
-    if req is None:
-        return
-
-    # Create/ Get the 'Age Rating' Tag Group
-    tag_group_age, tag_group_created = \
-        TagGroup.objects.get_or_create(name='Age Rating')
-
-    # Adds age rating tags for every game already on the database
-    print('{} games found'.format(len(req.json()['response']['docs'])))
-
-    for game in req.json()['response']['docs']:
-        if not SwitchGameEU.objects.filter(
-                game_code_unique=game['product_code_txt'][0].strip()[4:9]).exists():
-            continue
-
-        serializer = SwitchGameEUSerializer(data=game)
-
-        if serializer.is_valid():
-            switch_game_eu = SwitchGameEU.objects.get(
-                game_code_unique=game['product_code_txt'][0].strip()[4:9])
-
-            # If game has an age rating defined, add it as a tag
-            if 'age_rating_sorting_i' in game and game['age_rating_sorting_i'] != 0:
-                create_tag_if_not_exists(
-                    'PEGI ' + str(game['age_rating_sorting_i']),
-                    tag_group_age,
-                    switch_game_eu.switchgame)
+    backfill_tags('eu', ['age_rating'])
 
 
 # One off task made to update the production database
@@ -136,42 +98,4 @@ def update_switch_eu_age_tag():
 def update_switch_eu_physical_tag():
     print('Updating Switch EU games physical release tag...')
 
-    url = 'http://search.nintendo-europe.com/en/select'
-    params = {
-        'fq': 'type:GAME AND system_type:nintendoswitch* AND product_code_txt:*',
-        'q': '*',
-        'rows': 9999,
-        'sort': 'sorting_title asc',
-        'start': 0,
-        'wt': 'json',
-    }
-
-    # Make the request, and stop the task if there's any problem
-    req = treated_request(url, params, 'EU Switch games')
-    if req is None:
-        return
-
-    # Create/ Get the 'Characteristics' Tag Group
-    tag_group_characteristics, tag_group_created = \
-        TagGroup.objects.get_or_create(name='Characteristics')
-
-    # Adds physical release tags for every game already on the database
-    print('{} games found'.format(len(req.json()['response']['docs'])))
-
-    for game in req.json()['response']['docs']:
-        if not SwitchGameEU.objects.filter(
-                game_code_unique=game['product_code_txt'][0].strip()[4:9]).exists():
-            continue
-
-        serializer = SwitchGameEUSerializer(data=game)
-
-        if serializer.is_valid():
-            switch_game_eu = SwitchGameEU.objects.get(
-                game_code_unique=game['product_code_txt'][0].strip()[4:9])
-
-            # If game has physical version set to true
-            if 'physical_version_b' in game and game['physical_version_b'] == True:
-                create_tag_if_not_exists(
-                    'Physical Release',
-                    tag_group_characteristics,
-                    switch_game_eu.switchgame)
+    backfill_tags('eu', ['physical_release'])
@@ -1,14 +1,33 @@
-from celery import shared_task
+from collections import OrderedDict
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from celery import chord, shared_task
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
 
 from games.models import (
     SwitchGame,
     SwitchGameUS,
     SwitchGameEU,
     SwitchGamePrice,
+    SwitchGamePriceEvent,
+    SwitchGamePriceHistory,
+    SwitchGamePriceRun,
     SwitchGameSale,
 )
 
-from games.tasks.update_utils import treated_request
+from games.tasks.notify_wishlist_sales import notify_wishlist_sales
+from games.tasks.update_summary import (
+    refresh_game_summary,
+    update_switch_game_summary,
+)
+from games.tasks.update_utils import print_request_metrics, treated_request
+from eshop_crawler.db import bulk_upsert
+from eshop_crawler.settings import PRICE_API_URL, PRICE_FETCH_WORKERS
 
 from games.serializers import (
     SwitchGamePriceSerializer,
@@ -16,89 +35,437 @@ from games.serializers import (
 )
 
 
-@shared_task()
-def update_switch_price():
-    print('Updating Switch games\' prices...')
+PRICE_CHUNK_SIZE = 50
+PRICE_FAILED_CHUNKS_KEY = 'price_failed_chunks'
+PRICE_EVENTS_MAX_AGE = timedelta(days=30)
+
+PRICE_REGIONS = {
+    'us': SwitchGameUS,
+    'eu': SwitchGameEU,
+}
 
+PRICE_COUNTRIES = [
     # Prices in the America region
-    for country in ['US', 'CA', 'MX']: # , 'AR', 'BR', 'CL']:
-        update_country(country, SwitchGameUS)
+    ('US', 'us'), ('CA', 'us'), ('MX', 'us'),
+    # ('AR', 'us'), ('BR', 'us'), ('CL', 'us'),
 
     # Prices in the Europe region
-    for country in ['GB', 'DE', 'FR', 'ZA', 'RU']:
-        update_country(country, SwitchGameEU)
+    ('GB', 'eu'), ('DE', 'eu'), ('FR', 'eu'), ('ZA', 'eu'), ('RU', 'eu'),
+]
+
+
+# Every country's prices are split in chunks of nsuids, each updated by its
+# own subtask, so they're spread over every worker available. Once they're
+# all done, the totals are logged, the games' summary is rebuilt and the
+# chunks that failed are kept, so 'resume' can retry only them
+@shared_task()
+def update_switch_price(resume=False):
+    print('Updating Switch games\' prices...')
+
+    chunks = price_failed_chunks() if resume else price_chunks()
+    if len(chunks) == 0:
+        print('No Switch price chunks to update.')
+        return
+
+    print('Queueing {} Switch price chunks...'.format(len(chunks)))
+
+    chord(
+        update_switch_price_chunk.s(country, region, nsuids)
+        for country, region, nsuids in chunks
+    )(update_switch_price_totals.s())
+
+
+# Writes are upserts, so a chunk can safely run again (e.g. when resumed,
+# or redelivered after its worker died)
+@shared_task(acks_late=True)
+def update_switch_price_chunk(country, region, nsuids):
+    data = fetch_prices(country, nsuids)
+    result = save_price_chunk(country, region, nsuids, data)
+
+    print_request_metrics()
+
+    return result
+
+
+@shared_task()
+def update_switch_price_totals(results):
+    found = OrderedDict()
+    failed = []
+
+    for result in results:
+        found.setdefault(result['country'], [0, 0])
+
+        if result['failed']:
+            failed.append(
+                [result['country'], result['region'], result['nsuids']])
+            continue
+
+        found[result['country']][0] = \
+            found[result['country']][0] + result['prices']
+        found[result['country']][1] = \
+            found[result['country']][1] + result['sales']
+
+    for country, (found_price, found_sales) in found.items():
+        print('Found {} prices and {} sales for country {}'
+            .format(found_price, found_sales, country))
+
+    cache.set(PRICE_FAILED_CHUNKS_KEY, failed, None)
+    if len(failed):
+        print('{} Switch price chunks failed, resume to retry them.'
+              .format(len(failed)))
+
+    # Every chunk's events are committed by now, so they can be read
+    run = SwitchGamePriceRun.objects.create(
+        last_event_id=SwitchGamePriceEvent.objects
+        .aggregate(Max('id'))['id__max'] or 0)
+
+    # Events are only kept for their consumers to catch up
+    SwitchGamePriceEvent.objects \
+        .filter(date__lt=timezone.now() - PRICE_EVENTS_MAX_AGE) \
+        .delete()
+
+    SwitchGamePriceRun.objects \
+        .filter(id__lt=run.id,
+                date__lt=timezone.now() - PRICE_EVENTS_MAX_AGE) \
+        .delete()
+
+    # Rebuilt once every chunk is saved, so it never reads half of the prices
+    update_switch_game_summary()
+    notify_wishlist_sales()
 
     print('Finished updating Switch games\' prices.')
 
 
-def update_country(country, model):
-    url = 'https://api.ec.nintendo.com/v1/price'
-    count = model.objects.count()
+# Updates the chunks in this process instead, fetching them concurrently
+# with a pool of threads, while this thread saves the ones already fetched.
+# Only this thread touches the database
+def update_switch_price_local(resume=False):
+    print('Updating Switch games\' prices...')
+
+    chunks = price_failed_chunks() if resume else price_chunks()
+    results = []
+
+    with ThreadPoolExecutor(max_workers=PRICE_FETCH_WORKERS) as executor:
+        fetches = {
+            executor.submit(fetch_prices, country, nsuids):
+                (country, region, nsuids)
+            for country, region, nsuids in chunks
+        }
+
+        for fetch in as_completed(fetches):
+            country, region, nsuids = fetches[fetch]
+            results.append(
+                save_price_chunk(country, region, nsuids, fetch.result()))
+
+    print_request_metrics()
+    update_switch_price_totals(results)
+
+
+# [country, region, nsuids] lists, which fit in the tasks' JSON arguments
+def price_chunks(countries=None):
+    if countries is None:
+        countries = PRICE_COUNTRIES
+
+    chunks = []
+    region_nsuids = {}
+
+    # Sorted by nsuid, so the same games always make the same chunks, and
+    # recorded requests are found again by a replay into another database
+    for country, region in countries:
+        if region not in region_nsuids:
+            region_nsuids[region] = sorted(
+                nsuids_game_ids(PRICE_REGIONS[region]).keys())
+
+        nsuids = region_nsuids[region]
+
+        for offset in range(0, len(nsuids), PRICE_CHUNK_SIZE):
+            chunks.append(
+                [country, region, nsuids[offset:offset+PRICE_CHUNK_SIZE]])
+
+    return chunks
+
+
+def price_failed_chunks():
+    return cache.get(PRICE_FAILED_CHUNKS_KEY) or []
+
 
+def save_price_chunk(country, region, nsuids, data):
+    result = {
+        'country': country,
+        'region': region,
+        'nsuids': nsuids,
+        'failed': True,
+        'prices': 0,
+        'sales': 0,
+    }
+
+    if data is None:
+        return result
+
+    print('Updating {}\'s prices of {} games'.format(country, len(nsuids)))
+
+    try:
+        game_ids = nsuids_game_ids(PRICE_REGIONS[region], nsuids)
+        result['prices'], result['sales'] = \
+            save_prices(country, game_ids, data)
+    except Exception as e:
+        print('Saving {} Switch prices failed due to {}, skipping.'
+              .format(country, repr(e)))
+        return result
+
+    result['failed'] = False
+    return result
+
+
+# Every nsuid of the region (or just the given ones) and its game, resolved
+# with a single query
+def nsuids_game_ids(model, nsuids=None):
+    games = model.objects \
+        .filter(nsuid__isnull=False, switchgame__isnull=False) \
+        .order_by('id') \
+        .values_list('nsuid', 'switchgame__id')
+
+    if nsuids is not None:
+        games = games.filter(nsuid__in=nsuids)
+
+    game_ids = OrderedDict()
+    for nsuid, game_id in games:
+        if nsuid in game_ids:
+            print('Multiple games found for nsuid {}'.format(nsuid))
+            continue
+
+        game_ids[nsuid] = game_id
+
+    return game_ids
+
+
+# Runs in the pool's threads, so it must not use the database
+def fetch_prices(country, nsuids):
+    params = {
+        'lang': 'en',
+        'country': country,
+        'ids': ','.join(nsuids),
+    }
+    req = treated_request(
+        PRICE_API_URL, params, '{} Switch price'.format(country))
+
+    if req is None:
+        return None
+
+    try:
+        return req.json()['prices']
+    except (ValueError, KeyError):
+        print('Invalid {} Switch price response, skipping.'.format(country))
+        return None
+
+
+def save_prices(country, game_ids, data):
     found_price = 0
     found_sales = 0
 
-    for offset in range(0, count, 50):
-        print('Updating {}\'s price offset {}'.format(country, offset))
+    # Keyed by game, so each game is written only once per statement
+    prices = {}
+    sales = {}
+    stale_sales = set()
+
+    for price_info in data:
+        # The API sends the nsuids as numbers
+        nsuid = str(price_info['title_id'])
+        if nsuid not in game_ids:
+            continue
+
+        game_id = game_ids[nsuid]
+
+        if 'regular_price' in price_info:
+            found_price = found_price + 1
+
+            serialized = SwitchGamePriceSerializer(
+                data=price_info['regular_price'])
+
+            if serialized.is_valid():
+                prices[game_id] = SwitchGamePrice(
+                    game_id=game_id,
+                    country=country,
+
+                    amount=serialized.validated_data['amount'],
+                    currency=serialized.validated_data['currency'],
+                    raw_value=float(
+                        serialized.validated_data['raw_value']),
+                )
+
+        if 'discount_price' in price_info:
+            found_sales = found_sales + 1
+
+            serialized = SwitchGameSaleSerializer(
+                data=price_info['discount_price'])
+
+            if serialized.is_valid():
+                sales[game_id] = SwitchGameSale(
+                    game_id=game_id,
+                    country=country,
+
+                    amount=serialized.validated_data['amount'],
+                    currency=serialized.validated_data['currency'],
+                    raw_value=float(
+                        serialized.validated_data['raw_value']),
+
+                    start_datetime=serialized.validated_data
+                        .get('start_datetime'),
+                    end_datetime=serialized.validated_data
+                        .get('end_datetime'),
+                )
+
+        else:
+            stale_sales.add(game_id)
+
+    with transaction.atomic():
+        events = price_events(country, prices, sales, stale_sales)
+
+        bulk_upsert(
+            SwitchGamePrice,
+            list(prices.values()),
+            ['game', 'country'],
+            ['amount', 'currency', 'raw_value'])
+
+        bulk_upsert(
+            SwitchGameSale,
+            list(sales.values()),
+            ['game', 'country'],
+            ['amount', 'currency', 'raw_value',
+             'start_datetime', 'end_datetime'])
+
+        # A single DELETE, without collecting the sales first
+        if len(stale_sales):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'DELETE FROM {} WHERE country = %s '
+                    'AND game_id = ANY(%s)'
+                    .format(SwitchGameSale._meta.db_table),
+                    [country, list(stale_sales)])
+
+        save_price_history(country, prices, sales, timezone.now().date())
+        SwitchGamePriceEvent.objects.bulk_create(events)
+
+    # Writes above bypass the models' signals, so the chunk's summaries
+    # are refreshed here
+    refresh_game_summary(
+        list(set(prices) | set(sales) | stale_sales), [country])
+
+    return found_price, found_sales
+
+
+# Diffs the prices and sales about to be saved against the ones in the
+# database, returning the events of every game whose current price changed.
+# Once saved, running the same chunk again finds no changes
+def price_events(country, prices, sales, stale_sales):
+    game_ids = list(set(prices) | set(sales) | stale_sales)
+
+    old_prices = {
+        game_id: (raw_value, currency)
+        for game_id, raw_value, currency in SwitchGamePrice.objects
+        .filter(country=country, game_id__in=game_ids)
+        .values_list('game_id', 'raw_value', 'currency')
+    }
+
+    old_sales = {
+        game_id: (raw_value, currency)
+        for game_id, raw_value, currency in SwitchGameSale.objects
+        .filter(country=country, game_id__in=game_ids)
+        .values_list('game_id', 'raw_value', 'currency')
+    }
+
+    events = []
+
+    for game_id in game_ids:
+        old_price, currency = old_prices.get(game_id, (None, None))
+        old_sale, currency = old_sales.get(game_id, (None, currency))
+
+        new_price = old_price
+        if game_id in prices:
+            new_price = prices[game_id].raw_value
+            currency = prices[game_id].currency
+
+        new_sale = None if game_id in stale_sales else old_sale
+        if game_id in sales:
+            new_sale = sales[game_id].raw_value
+            currency = sales[game_id].currency
+
+        old_current = old_sale if old_sale is not None else old_price
+        new_current = new_sale if new_sale is not None else new_price
 
-        games = model.objects.all()[offset:offset+50].values('nsuid')
-        games = list(map(lambda game: game['nsuid'], games))
-        games = ','.join([nsuid for nsuid in games if nsuid != None])
+        if new_current is None:
+            continue
 
-        params = {'lang': 'en', 'country': country, 'ids': games}
-        req = treated_request(url, params, 'US Switch price')
+        if old_sale is None and new_sale is not None:
+            kind = SwitchGamePriceEvent.SALE_STARTED
+        elif old_sale is not None and new_sale is None:
+            kind = SwitchGamePriceEvent.SALE_ENDED
+        elif old_current is not None and old_current != new_current:
+            kind = SwitchGamePriceEvent.PRICE_CHANGED
+        else:
+            continue
 
-        data = req.json()['prices']
+        events.append(SwitchGamePriceEvent(
+            game_id=game_id,
+            country=country,
+            kind=kind,
 
-        for price_info in data:
-            if model.objects.filter(nsuid=price_info['title_id']).count() > 1:
-                print('Multiple games found for nsuid {}'.format(price_info['title_id']))
+            currency=currency,
+            old_value=old_current,
+            new_value=new_current,
+        ))
 
-            game = model.objects.filter(nsuid=price_info['title_id'])[0]
+    return events
 
-            if 'regular_price' in price_info:
-                found_price = found_price + 1
 
-                if SwitchGamePrice.objects.filter(game=game.switchgame,
-                                                  country=country).exists():
-                    price = SwitchGamePrice.objects.get(
-                        game=game.switchgame, country=country)
+# Extends the last history run of each game if its price and sale value are
+# still the same, or starts a new run from today otherwise
+def save_price_history(country, prices, sales, today):
+    last_runs = {
+        run.game_id: run
+        for run in SwitchGamePriceHistory.objects
+        .filter(game_id__in=list(prices), country=country)
+        .order_by('game_id', '-start_date')
+        .distinct('game_id')
+    }
 
-                    serialized = SwitchGamePriceSerializer(
-                        data=price_info['regular_price'],
-                        context={'game': game.switchgame, 'country': country},
-                        instance=price)
-                else:
-                    serialized = SwitchGamePriceSerializer(
-                        data=price_info['regular_price'],
-                        context={'game': game.switchgame, 'country': country})
+    extended = []
+    new_runs = []
 
-                if serialized.is_valid():
-                    serialized.save()
+    for game_id, price in prices.items():
+        sales_value = sales[game_id].raw_value if game_id in sales else None
+        run = last_runs.get(game_id)
 
-            if 'discount_price' in price_info:
-                found_sales = found_sales + 1
+        if (
+            run is not None and
+            run.currency == price.currency and
+            run.price_value == price.raw_value and
+            run.sales_value == sales_value
+        ):
+            if run.end_date < today:
+                extended.append(run.id)
+            continue
 
-                if SwitchGameSale.objects.filter(game=game.switchgame,
-                                                 country=country).exists():
-                    price = SwitchGameSale.objects.get(
-                        game=game.switchgame, country=country)
+        new_runs.append(SwitchGamePriceHistory(
+            game_id=game_id,
+            country=country,
 
-                    serialized = SwitchGameSaleSerializer(
-                        data=price_info['discount_price'],
-                        instance=price,
-                        context={'game': game.switchgame, 'country': country})
-                else:
-                    serialized = SwitchGameSaleSerializer(
-                        data=price_info['discount_price'],
-                        context={'game': game.switchgame, 'country': country})
+            currency=price.currency,
+            price_value=price.raw_value,
+            sales_value=sales_value,
 
-                if serialized.is_valid():
-                    serialized.save()
+            start_date=today,
+            end_date=today,
+        ))
 
-            else:
-                SwitchGameSale.objects \
-                    .filter(game=game.switchgame, country=country).delete()
+    if len(extended):
+        SwitchGamePriceHistory.objects \
+            .filter(id__in=extended) \
+            .update(end_date=today)
 
-    print('Found {} prices and {} sales for country {}'
-        .format(found_price, found_sales, country))
+    # A run already started today is overwritten, if prices changed again
+    bulk_upsert(
+        SwitchGamePriceHistory,
+        new_runs,
+        ['game', 'country', 'start_date'],
+        ['currency', 'price_value', 'sales_value', 'end_date'])
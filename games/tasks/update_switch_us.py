@@ -1,160 +1,98 @@
 from celery import shared_task
 
-import requests
-from requests.exceptions import Timeout, ConnectionError
-
-import re
-
-from classification.models.tag import TagGroup
 from games.models import SwitchGameUS
 from games.serializers import SwitchGameUSSerializer
-from games.tasks.update_utils import treated_request, create_tag_if_not_exists
+from games.tasks.pipeline import (
+    backfill_tags,
+    save_snapshot,
+    us_catalog,
+    us_game_code,
+    TagEnricher,
+)
+from games.tasks.update_search import update_search_vector
+from games.tasks.update_utils import print_request_metrics, record_hash
+
 
+# Fields of the upstream records that are saved, either in the game itself
+# or as its tags
+US_HASHED_FIELDS = list(SwitchGameUSSerializer._declared_fields.keys()) + \
+    ['free_to_start', 'categories']
 
+
+# Only games created or changed upstream since the last run are saved,
+# unless 'full' is set
 @shared_task()
-def update_switch_us():
+def update_switch_us(full=False):
     print('Updating Switch US games...')
 
-    url = 'http://www.nintendo.com/json/content/get/filter/game'
-    params = {
-        'system': 'switch',
-        'sort': 'title',
-        'direction': 'asc',
-        'limit': 200,
-        'offset': 0
+    tag_enricher = TagEnricher('us')
+
+    # Ids and fingerprints of every game already in the database, by code
+    known_games = {
+        game_code: (game_id, content_hash)
+        for game_id, game_code, content_hash in SwitchGameUS.objects
+        .values_list('id', 'game_code_unique', 'content_hash')
     }
 
-    tag_group_genre, tag_group_created = \
-        TagGroup.objects.get_or_create(name='Genre')
+    created = 0
+    updated = 0
 
-    tag_group_characteristics, tag_group_created = \
-        TagGroup.objects.get_or_create(name='Characteristics')
+    # Add every new or changed game to the database
+    for game in save_snapshot('us', us_catalog()):
+        game_code = us_game_code(game)
 
-    for offset in range(0, 3000, 200):
-        # Make the request, and skip current offset if there's any problem
-        params['offset'] = offset
-        req = treated_request(url, params, 'US Switch games')
-        if req is None:
-            print('Request for us games failed at offset {}, skipping.'
-                  .format(offset))
+        # If unique code is empty (usually unreleased games), skip game
+        if game_code == '':
+            print('Empty unique code found for {}'.format(game['title']))
             continue
 
-        # If offset hasn't gone beyond the last game yet
-        if 'game' in req.json()['games']:
-            print('{} games found at offset {}'
-                  .format(len(req.json()['games']['game']), offset))
-
-            # Add every game to the database
-            for game in req.json()['games']['game']:
-                game_code = re.sub(r'[\-\. ]+', '', game['game_code'])
-
-                # If unique code is empty (usually unreleased games), skip game
-                if game_code[4:9] is '':
-                    print('Empty unique code found for {}'
-                          .format(game['title']))
-                    continue
-
-                # If game already in DB, skip it
-                if SwitchGameUS.objects \
-                        .filter(game_code_unique=game_code[4:9]) \
-                        .exists():
-                    # print('Game {} already in DB.'.format(game['title']))
-                    continue
-
-                # If game not yet in DB, save it
-                else:
-                    serializer = SwitchGameUSSerializer(data=game)
-                    if serializer.is_valid():
-                        # print('Added: {}'.format(game['title']))
-                        switch_game_us = serializer.save()
-                    else:
-                        print('[ERROR] ({}): {}'.format(game['title'],
-                              serializer.errors))
-                        continue
-
-                # For each tag, create if it doesn't exist yet and assign it to
-                # the game
-                if game['free_to_start'] == 'true':
-                    create_tag_if_not_exists(
-                        'Free to Play',
-                        tag_group_characteristics,
-                        switch_game_us.switchgame)
-
-                if isinstance(game['categories']['category'], str):
-                    # Checking if string is necessary for games with a single
-                    # category (multiple categories come in an array)
-                    create_tag_if_not_exists(
-                        game['categories']['category'],
-                        tag_group_genre,
-                        switch_game_us.switchgame)
-
-                else:
-                    for tag_name in game['categories']['category']:
-                        create_tag_if_not_exists(
-                            tag_name,
-                            tag_group_genre,
-                            switch_game_us.switchgame)
-
-        # If offset went beyond the last game, break the for loop
-        else:
-            break
-
+        content_hash = record_hash(game, US_HASHED_FIELDS)
+        known_game = known_games.get(game_code)
 
-@shared_task()
-def update_switch_us_free_tag():
-    print('Updating Switch US games "Free To Play" tag...')
+        # If game already in DB and unchanged, skip it
+        if known_game and known_game[1] == content_hash and not full:
+            continue
 
-    url = 'http://www.nintendo.com/json/content/get/filter/game'
-    params = {
-        'system': 'switch',
-        'sort': 'title',
-        'direction': 'asc',
-        'limit': 200,
-        'offset': 0
-    }
+        # If game already in DB, update it
+        elif known_game:
+            serializer = SwitchGameUSSerializer(
+                SwitchGameUS.objects.get(id=known_game[0]),
+                data=game,
+                context={'content_hash': content_hash})
 
-    tag_group_characteristics, tag_group_created = \
-        TagGroup.objects.get_or_create(name='Characteristics')
+        # If game not yet in DB, save it
+        else:
+            serializer = SwitchGameUSSerializer(
+                data=game,
+                context={'content_hash': content_hash})
 
-    for offset in range(0, 3000, 200):
-        # Make the request, and skip current offset if there's any problem
-        params['offset'] = offset
-        req = treated_request(url, params, 'US Switch games')
-        if req is None:
-            print('Request for us games failed at offset {}, skipping.'
-                  .format(offset))
+        if serializer.is_valid():
+            switch_game_us = serializer.save()
+        else:
+            print('[ERROR] ({}): {}'.format(game['title'], serializer.errors))
             continue
 
-        # If offset hasn't gone beyond the last game yet
-        if 'game' in req.json()['games']:
-            print('{} games found at offset {}'
-                  .format(len(req.json()['games']['game']), offset))
-
-            # Iterate over every game already in the database
-            for game in req.json()['games']['game']:
-                game_code = re.sub(r'[\-\. ]+', '', game['game_code'])
-
-                # If unique code is empty (unreleased games), skip game
-                if game_code[4:9] is '':
-                    print('Empty unique code found for {}'
-                          .format(game['title']))
-                    continue
-
-                # If game not yet in DB, skip it
-                if not SwitchGameUS.objects \
-                        .filter(game_code_unique=game_code[4:9]) \
-                        .exists():
-                    continue
-
-                switch_game_us = SwitchGameUS.objects \
-                    .get(game_code_unique=game_code[4:9])
-
-                if game['free_to_start'] == 'true':
-                    create_tag_if_not_exists(
-                        'Free to Play',
-                        tag_group_characteristics,
-                        switch_game_us.switchgame)
-
-        # If offset went beyond the last game, break the for loop
+        if known_game:
+            updated = updated + 1
         else:
-            break
\ No newline at end of file
+            created = created + 1
+
+        known_games[game_code] = (switch_game_us.id, content_hash)
+
+        # Assign the game's genres and characteristics as tags, unless it
+        # isn't linked to a game (e.g. the game was deleted)
+        if hasattr(switch_game_us, 'switchgame'):
+            tag_enricher.enrich(game, switch_game_us.switchgame.id)
+
+    print('{} US games created and {} updated'.format(created, updated))
+    print_request_metrics()
+
+    tag_enricher.flush()
+    update_search_vector()
+
+
+@shared_task()
+def update_switch_us_free_tag():
+    print('Updating Switch US games "Free To Play" tag...')
+
+    backfill_tags('us', ['free_to_play'])
@@ -1,37 +1,319 @@
+import gzip
+import json
+import os
+from collections import defaultdict
+from hashlib import sha1
+from random import uniform
+from threading import BoundedSemaphore, Lock
+from time import monotonic, sleep
+from urllib.parse import urlparse
+
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import Timeout, ConnectionError
 
 from classification.models.tag import Tag, ConfirmedTag
+from eshop_crawler.db import bulk_upsert
+from games.tasks.update_search import update_search_vector
+from games.tasks.update_summary import refresh_game_summary
+from eshop_crawler.settings import (
+    REQUEST_CONNECT_TIMEOUT,
+    REQUEST_READ_TIMEOUT,
+    REQUEST_RETRIES,
+    REQUEST_BACKOFF,
+    REQUEST_BACKOFF_JITTER,
+    REQUEST_HOST_CONCURRENCY,
+    REQUEST_HOST_INTERVAL,
+    REQUEST_MODE,
+    REQUEST_SNAPSHOT_DIR,
+)
+
+
+# A single session for every crawler request, so connections are kept alive
+# and reused between them, instead of a new TCP/TLS handshake each time.
+# Each process makes its own, as pooled connections can't be shared by the
+# processes forked from it (e.g. Celery's workers)
+_session = None
+_session_pid = None
+_session_lock = Lock()
+
+
+def http_session():
+    global _session, _session_pid
+
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            adapter = HTTPAdapter(pool_maxsize=REQUEST_HOST_CONCURRENCY)
+
+            _session = requests.Session()
+            _session.mount('http://', adapter)
+            _session.mount('https://', adapter)
+            _session_pid = os.getpid()
+
+        return _session
+
+
+# Limits how many requests run at once on each host, however many threads
+# are making them, and how often they start
+class HostLimiter:
+    def __init__(self):
+        self.semaphore = BoundedSemaphore(REQUEST_HOST_CONCURRENCY)
+        self.lock = Lock()
+        self.next_start = 0
+
+    def __enter__(self):
+        self.semaphore.acquire()
+
+        # Each request books the next free start time, and waits for it
+        with self.lock:
+            start = max(monotonic(), self.next_start)
+            self.next_start = start + REQUEST_HOST_INTERVAL
+
+        sleep(max(0, start - monotonic()))
+
+    def __exit__(self, *args):
+        self.semaphore.release()
+
+
+_host_limiters = {}
+_host_limiters_lock = Lock()
 
 
+def host_limiter(url):
+    host = urlparse(url).netloc
+
+    with _host_limiters_lock:
+        if host not in _host_limiters:
+            _host_limiters[host] = HostLimiter()
+
+        return _host_limiters[host]
+
+
+# METRICS
+# Requests, failures, retries, bytes received and latency (in seconds) of
+# every request made by the process, by task name
+_request_metrics = defaultdict(lambda: {
+    'requests': 0,
+    'failures': 0,
+    'retries': 0,
+    'bytes': 0,
+    'latency': 0,
+    'max_latency': 0,
+})
+_request_metrics_lock = Lock()
+
+
+def track_request(task_name, retries, latency=0, size=None):
+    with _request_metrics_lock:
+        metrics = _request_metrics[task_name]
+
+        metrics['requests'] = metrics['requests'] + 1
+        metrics['retries'] = metrics['retries'] + retries
+        metrics['latency'] = metrics['latency'] + latency
+        metrics['max_latency'] = max(metrics['max_latency'], latency)
+
+        if size is None:
+            metrics['failures'] = metrics['failures'] + 1
+        else:
+            metrics['bytes'] = metrics['bytes'] + size
+
+
+# Returns the metrics gathered since the last reset, and resets them
+def pop_request_metrics():
+    with _request_metrics_lock:
+        metrics = {
+            task_name: dict(task_metrics)
+            for task_name, task_metrics in _request_metrics.items()
+        }
+        _request_metrics.clear()
+
+    return metrics
+
+
+def print_request_metrics():
+    for task_name, metrics in sorted(pop_request_metrics().items()):
+        print('Requests for {}: {} made, {} failed, {} retries, {:.1f} KB, '
+              '{:.2f}s average and {:.2f}s max latency'.format(
+                  task_name,
+                  metrics['requests'],
+                  metrics['failures'],
+                  metrics['retries'],
+                  metrics['bytes'] / 1024,
+                  metrics['latency'] / metrics['requests'],
+                  metrics['max_latency']))
+
+
+# Timeouts, connection errors and server errors are retried with an
+# exponential backoff, and None is returned if every attempt fails.
+# Responses are also saved to disk when REQUEST_MODE is 'record', and read
+# back from there instead of requested when it's 'replay'
 def treated_request(url, params, task_name):
-    try:
-        req = requests.get(url, params=params)
-    except Timeout:
-        print('Request for {} failed due to a time out, aborting.'
-              .format(task_name))
-        return None
-    except ConnectionError:
-        print('Request for {} failed due to a connection error, aborting.'
-              .format(task_name))
-        return None
-    except:
-        print('Request for {} failed due to an unknown error, aborting.'
-              .format(task_name))
+    if REQUEST_MODE == 'replay':
+        return replayed_request(url, params, task_name)
+
+    for attempt in range(REQUEST_RETRIES + 1):
+        if attempt > 0:
+            sleep(REQUEST_BACKOFF * 2 ** (attempt - 1) +
+                  uniform(0, REQUEST_BACKOFF_JITTER))
+
+        try:
+            with host_limiter(url):
+                started = monotonic()
+                req = http_session().get(
+                    url, params=params,
+                    timeout=(REQUEST_CONNECT_TIMEOUT, REQUEST_READ_TIMEOUT))
+        except Timeout:
+            print('Request for {} failed due to a time out (attempt {}).'
+                  .format(task_name, attempt + 1))
+            continue
+        except ConnectionError:
+            print('Request for {} failed due to a connection error '
+                  '(attempt {}).'.format(task_name, attempt + 1))
+            continue
+        except:
+            print('Request for {} failed due to an unknown error, aborting.'
+                  .format(task_name))
+            track_request(task_name, attempt)
+            return None
+
+        if req.status_code >= 500 or req.status_code == 429:
+            print('Request for {} failed with status {} (attempt {}).'
+                  .format(task_name, req.status_code, attempt + 1))
+            continue
+
+        track_request(
+            task_name, attempt, monotonic() - started, len(req.content))
+
+        if REQUEST_MODE == 'record':
+            record_request(url, params, req)
+
+        return req
+
+    print('Request for {} failed after {} attempts, aborting.'
+          .format(task_name, REQUEST_RETRIES + 1))
+    track_request(task_name, REQUEST_RETRIES)
+    return None
+
+
+# RECORD/ REPLAY
+# Each response is saved as a gzipped JSON file, named after its url and
+# params, under a directory for its host
+def recorded_request_path(url, params):
+    key = json.dumps([url, sorted((params or {}).items())], default=str)
+
+    return os.path.join(
+        REQUEST_SNAPSHOT_DIR,
+        urlparse(url).netloc.replace(':', '_'),
+        sha1(key.encode()).hexdigest() + '.json.gz')
+
+
+def record_request(url, params, req):
+    path = recorded_request_path(url, params)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Written to a temporary file first, so a replay never reads half of it
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with gzip.open(temp_path, 'wt') as recorded:
+        json.dump({
+            'url': url,
+            'params': params,
+            'status_code': req.status_code,
+            'content': req.text,
+        }, recorded, default=str)
+
+    os.replace(temp_path, path)
+
+
+def replayed_request(url, params, task_name):
+    path = recorded_request_path(url, params)
+
+    if not os.path.exists(path):
+        print('No recorded response for {} ({}), aborting.'
+              .format(task_name, url))
         return None
 
+    with gzip.open(path, 'rt') as recorded:
+        recorded = json.load(recorded)
+
+    req = requests.Response()
+    req.url = recorded['url']
+    req.status_code = recorded['status_code']
+    req.encoding = 'utf-8'
+    req._content = recorded['content'].encode('utf-8')
+
     return req
 
 
-def create_tag_if_not_exists(tag_name, tag_group, game):
-    tag, tag_created = Tag.objects.get_or_create(
-        name=tag_name,
-        tag_group=tag_group)
+# Gathers the tags assigned by Nintendo during a crawl, and saves them all
+# at once when flushed. Existing tags and confirmed tags are loaded once, so
+# assigning a tag costs no queries
+class TagResolver:
+    def __init__(self):
+        self.tag_ids = {
+            (name, tag_group_id): tag_id
+            for tag_id, name, tag_group_id in Tag.objects
+            .values_list('id', 'name', 'tag_group_id')
+        }
+
+        self.confirmed = set(
+            ConfirmedTag.objects
+            .filter(confirmed_by=ConfirmedTag.NINTENDO)
+            .values_list('tag_id', 'game_id')
+        )
+
+        # (tag name, tag group id, game id) tuples
+        self.pending = set()
+
+    def add(self, tag_name, tag_group_id, game_id):
+        self.pending.add((tag_name, tag_group_id, game_id))
+
+    def flush(self):
+        new_tags = set(
+            (name, tag_group_id)
+            for name, tag_group_id, game_id in self.pending
+            if (name, tag_group_id) not in self.tag_ids
+        )
+
+        if len(new_tags):
+            bulk_upsert(
+                Tag,
+                [Tag(name=name, tag_group_id=tag_group_id)
+                 for name, tag_group_id in new_tags],
+                ['name', 'tag_group'])
+
+            for tag_id, name, tag_group_id in Tag.objects \
+                    .filter(name__in=[name for name, group in new_tags]) \
+                    .values_list('id', 'name', 'tag_group_id'):
+                if (name, tag_group_id) in new_tags:
+                    print('Added tag: {}'.format(name))
+                    self.tag_ids[(name, tag_group_id)] = tag_id
+
+        new_confirmed = set(
+            (self.tag_ids[(name, tag_group_id)], game_id)
+            for name, tag_group_id, game_id in self.pending
+        ) - self.confirmed
+
+        bulk_upsert(
+            ConfirmedTag,
+            [ConfirmedTag(tag_id=tag_id, game_id=game_id,
+                          confirmed_by=ConfirmedTag.NINTENDO)
+             for tag_id, game_id in new_confirmed],
+            ['tag', 'game', 'confirmed_by'])
+
+        self.confirmed = self.confirmed | new_confirmed
+        self.pending = set()
+
+        # The inserts above bypass the models' signals
+        game_ids = list(set(game_id for tag_id, game_id in new_confirmed))
+        if len(game_ids):
+            refresh_game_summary(game_ids)
+            update_search_vector(game_ids)
+
 
-    if tag_created:
-        print('Added tag: {}'.format(tag_name))
+# Fingerprint of the given fields of an upstream record
+def record_hash(record, fields):
+    content = {field: record.get(field) for field in fields}
 
-    ConfirmedTag.objects.get_or_create(
-        tag=tag,
-        game=game,
-        confirmed_by=ConfirmedTag.NINTENDO)
+    return sha1(
+        json.dumps(content, sort_keys=True, default=str).encode()
+    ).hexdigest()
@@ -6,6 +6,7 @@ from games.api.game import (
     all_games_select_id,
     all_games_select_game_code,
 )
+from games.api.suggest import games_suggest
 
 
 urlpatterns = [
@@ -17,4 +18,7 @@ urlpatterns = [
 
     url(r'^all_select/game_code$',
         all_games_select_game_code),
+
+    url(r'^suggest/$',
+        games_suggest),
 ]
@@ -2,10 +2,22 @@ from django.conf.urls import url
 
 from games.api.price import (
     all_price_game_code,
+    lowest_price_game_code,
+    price_events,
+    price_history_game_code,
 )
 
 
 urlpatterns = [
     url(r'^all/by_code/(?P<game_code>[A-Z0-9]{5})/$',
         all_price_game_code),
+
+    url(r'^history/by_code/(?P<game_code>[A-Z0-9]{5})/$',
+        price_history_game_code),
+
+    url(r'^lowest/by_code/(?P<game_code>[A-Z0-9]{5})/$',
+        lowest_price_game_code),
+
+    url(r'^events/$',
+        price_events),
 ]
@@ -7,11 +7,10 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from classification.models import Recomendation
-from classification.serializers import recomendation_to_json
-from classification.api.recomendation import recomendation_all_base_query
+from games.api.pagination import decode_cursor, paginate_by_cursor
+from users.api.newsfeed import newsfeed_to_json
 from users.models import Following
-from users.serializers.user_profile import user_to_card_json
+from users.serializers.user_profile import users_to_card_json
 
 
 @api_view(['POST', 'DELETE'])
@@ -40,21 +39,7 @@ def follow_by_username(request, username):
 @api_view(['GET'])
 @permission_classes((IsAuthenticated,))
 def newsfeed(request):
-    users_following = list(map(
-        lambda x: x.followed,
-        request.user.follower.all()
-    ))
-
-    news = recomendation_all_base_query() \
-        .annotate(username=F('user__username')) \
-        .filter(user__in=users_following) \
-        .order_by('-date')[:30]
-
-    response = list(map(lambda x: {
-        'game': recomendation_to_json(x, request.user),
-        'username': x.username,
-        'recomends': x.recomends,
-    }, news))
+    response = newsfeed_to_json(request.user, 30)
 
     return Response(response, status=status.HTTP_200_OK)
 
@@ -62,8 +47,45 @@ def newsfeed(request):
 @api_view(['GET'])
 @permission_classes((IsAuthenticated,))
 def user_following(request):
-    following = request.user.follower.all()
-    response = list(map(lambda x: user_to_card_json(x.followed), following))
+    quantity = request.query_params.get('qtd', None)
+    offset = request.query_params.get('offset', 0)
+    cursor = request.query_params.get('cursor', None)
+
+    try:
+        if quantity:
+            quantity = int(quantity)
+        if offset:
+            offset = int(offset)
+    except ValueError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+    # Querysets can't be sliced by negative indexes
+    if (quantity and quantity < 0) or offset < 0:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+    following = request.user.follower \
+        .select_related('followed') \
+        .annotate(username=F('followed__username'))
+
+    if cursor is not None:
+        try:
+            following, next_cursor = paginate_by_cursor(
+                following, ['username', 'id'], decode_cursor(cursor),
+                quantity)
+        except ValueError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        response = {
+            'users': users_to_card_json(x.followed for x in following),
+            'next_cursor': next_cursor,
+        }
+        return Response(response, status=status.HTTP_200_OK)
+
+    following = following.order_by('username', 'id')[
+        offset: offset + quantity if quantity else None
+    ]
+
+    response = users_to_card_json(x.followed for x in following)
 
     return Response(
         response,
@@ -0,0 +1,69 @@
+from django.db.models import F
+
+from classification.serializers import recomendations_to_json
+from games.models import SwitchGameSummary
+from users.models import NewsfeedEntry
+
+
+NEWSFEED_COUNTRY = 'US'
+
+
+# The newest recomendations of a user's newsfeed, with their games' info
+# read from the summaries instead of aggregated from the games
+def newsfeed_recomendations(user, quantity):
+    entries = NewsfeedEntry.objects \
+        .filter(user=user, recomendation__game__hide=False) \
+        .select_related(
+            'recomendation',
+            'recomendation__user',
+            'recomendation__game',
+        ) \
+        .annotate(review_id=F('recomendation__review__id')) \
+        .order_by('-date', '-id')[:quantity]
+
+    recomendations = []
+    for entry in entries:
+        recomendation = entry.recomendation
+        recomendation.review_id = entry.review_id
+        recomendations.append(recomendation)
+
+    summaries = {
+        summary.game_id: summary
+        for summary in SwitchGameSummary.objects.filter(
+            country=NEWSFEED_COUNTRY,
+            game_id__in=[
+                recomendation.game_id for recomendation in recomendations],
+        )
+    }
+
+    # The same annotations 'recomendation_all_base_query' makes
+    recomendations = [
+        recomendation for recomendation in recomendations
+        if recomendation.game_id in summaries
+    ]
+
+    for recomendation in recomendations:
+        summary = summaries[recomendation.game_id]
+
+        recomendation.game_title = summary.title
+        recomendation.game_code = recomendation.game.game_code_unique
+        recomendation.game_image = summary.image
+        recomendation.release_us = summary.release_us
+        recomendation.release_eu = summary.release_eu
+        recomendation.tags = summary.tags
+
+    return recomendations
+
+
+def newsfeed_to_json(user, quantity):
+    recomendations = newsfeed_recomendations(user, quantity)
+
+    return [
+        {
+            'game': recomendation_json,
+            'username': recomendation.user.username,
+            'recomends': recomendation.recomends,
+        }
+        for recomendation, recomendation_json in zip(
+            recomendations, recomendations_to_json(recomendations, user))
+    ]
@@ -7,3 +7,7 @@ class AccountActivationEmail(template_mail.TemplateMail):
 
 class AccountPasswordResetEmail(template_mail.TemplateMail):
     name = "account_password_reset"
+
+
+class WishlistSalesEmail(template_mail.TemplateMail):
+    name = "wishlist_sales"
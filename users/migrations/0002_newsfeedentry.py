@@ -0,0 +1,62 @@
+# Generated by Django 2.1 on 2026-10-18 12:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Fills the newsfeeds of the users already following someone with the
+# latest recomendations of the users they follow
+def fill_newsfeeds(apps, schema_editor):
+    Following = apps.get_model('users', 'Following')
+    NewsfeedEntry = apps.get_model('users', 'NewsfeedEntry')
+    Recomendation = apps.get_model('classification', 'Recomendation')
+
+    followers = Following.objects \
+        .values_list('follower_id', flat=True) \
+        .distinct()
+
+    for follower_id in followers:
+        recomendations = Recomendation.objects \
+            .filter(user_id__in=Following.objects
+                    .filter(follower_id=follower_id)
+                    .values('followed_id')) \
+            .order_by('-date')[:200]
+
+        NewsfeedEntry.objects.bulk_create([
+            NewsfeedEntry(
+                user_id=follower_id,
+                recomendation_id=recomendation.id,
+                date=recomendation.date,
+            )
+            for recomendation in recomendations
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classification', '0001_initial'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsfeedEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateTimeField()),
+                ('recomendation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='classification.Recomendation')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='newsfeedentry',
+            index=models.Index(fields=['user', '-date'], name='users_newsf_user_id_1a1a61_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='newsfeedentry',
+            unique_together={('user', 'recomendation')},
+        ),
+        migrations.RunPython(fill_newsfeeds, migrations.RunPython.noop),
+    ]
@@ -30,3 +30,22 @@ class Following(models.Model):
     def __str__(self):
         return '{} following {}'.format(self.follower.first_name,
                                         self.followed.first_name)
+
+
+# Timeline of a user's newsfeed: the latest recomendations of the users they
+# follow, written when the recomendations are saved, so reading a feed
+# doesn't depend on how many users are followed
+class NewsfeedEntry(models.Model):
+    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
+    recomendation = models.ForeignKey(
+        'classification.Recomendation',
+        on_delete=models.CASCADE,
+    )
+    date = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'recomendation')
+        indexes = [models.Index(fields=['user', '-date'])]
+
+    def __str__(self):
+        return '{} newsfeed: {}'.format(self.user, self.recomendation)
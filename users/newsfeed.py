@@ -0,0 +1,79 @@
+from django.db import connection
+
+from classification.models import Recomendation
+from users.models import Following, NewsfeedEntry
+from eshop_crawler.db import bulk_upsert
+
+
+NEWSFEED_MAX_LENGTH = 200
+
+
+# Entries are upserted, so saving them again (e.g. a recomendation saved
+# twice at once, or while its user is followed) only updates their dates
+def newsfeed_save(entries):
+    bulk_upsert(NewsfeedEntry, entries, ['user', 'recomendation'], ['date'])
+
+
+# Adds a saved recomendation to the newsfeed of every follower of its user,
+# on top, as the feeds are sorted by the recomendations' dates
+def newsfeed_add_recomendation(recomendation):
+    follower_ids = list(
+        Following.objects
+        .filter(followed_id=recomendation.user_id)
+        .values_list('follower_id', flat=True)
+    )
+
+    if len(follower_ids) == 0:
+        return
+
+    newsfeed_save([
+        NewsfeedEntry(
+            user_id=follower_id,
+            recomendation_id=recomendation.id,
+            date=recomendation.date,
+        )
+        for follower_id in follower_ids
+    ])
+
+    newsfeed_trim(follower_ids)
+
+
+# Adds the latest recomendations of a newly followed user to the follower's
+# newsfeed
+def newsfeed_follow(follower_id, followed_id):
+    recomendations = Recomendation.objects \
+        .filter(user_id=followed_id) \
+        .order_by('-date') \
+        .values_list('id', 'date')[:NEWSFEED_MAX_LENGTH]
+
+    newsfeed_save([
+        NewsfeedEntry(
+            user_id=follower_id,
+            recomendation_id=recomendation_id,
+            date=date,
+        )
+        for recomendation_id, date in recomendations
+    ])
+
+    newsfeed_trim([follower_id])
+
+
+def newsfeed_unfollow(follower_id, followed_id):
+    NewsfeedEntry.objects \
+        .filter(user_id=follower_id, recomendation__user_id=followed_id) \
+        .delete()
+
+
+# Deletes, with a single statement, every entry beyond the newest
+# NEWSFEED_MAX_LENGTH of each of the given users' newsfeeds
+def newsfeed_trim(user_ids):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'DELETE FROM {0} WHERE id IN ('
+            'SELECT id FROM ('
+            'SELECT id, row_number() OVER ('
+            'PARTITION BY user_id ORDER BY date DESC, id DESC) AS position '
+            'FROM {0} WHERE user_id = ANY(%s)'
+            ') AS ranked WHERE position > %s)'
+            .format(NewsfeedEntry._meta.db_table),
+            [list(user_ids), NEWSFEED_MAX_LENGTH])
@@ -1,4 +1,9 @@
+from collections import defaultdict
+
 from django.contrib.auth.models import AnonymousUser
+from django.db.models import Count, Q
+
+from classification.models import Recomendation, Review
 from users.models import Following
 
 
@@ -18,12 +23,56 @@ def user_to_profile_json(user, request):
     return profile_json
 
 
-def user_to_card_json(user):
+# 'counters', when given, are the user's likes, dislikes and reviews, as
+# returned by 'users_card_counters', and take the place of the count queries
+def user_to_card_json(user, counters=None):
     json = {}
 
     json['username'] = user.username
+
+    if counters is not None:
+        json['likes'] = counters['likes']
+        json['dislikes'] = counters['dislikes']
+        json['reviews'] = counters['reviews']
+        return json
+
     json['likes'] = user.recomendation_set.filter(recomends=True).count()
     json['dislikes'] = user.recomendation_set.filter(recomends=False).count()
     json['reviews'] = user.review_set.count()
 
     return json
+
+
+def users_to_card_json(users):
+    users = list(users)
+    counters = users_card_counters([user.id for user in users])
+
+    return [user_to_card_json(user, counters[user.id]) for user in users]
+
+
+# Likes, dislikes and reviews of each of the given users, counted by two
+# grouped queries
+def users_card_counters(user_ids):
+    counters = defaultdict(lambda: {'likes': 0, 'dislikes': 0, 'reviews': 0})
+
+    recomendations = Recomendation.objects \
+        .filter(user_id__in=user_ids) \
+        .values('user_id') \
+        .annotate(likes=Count('id', filter=Q(recomends=True))) \
+        .annotate(dislikes=Count('id', filter=Q(recomends=False))) \
+        .order_by()
+
+    for row in recomendations:
+        counters[row['user_id']]['likes'] = row['likes']
+        counters[row['user_id']]['dislikes'] = row['dislikes']
+
+    reviews = Review.objects \
+        .filter(user_id__in=user_ids) \
+        .values('user_id') \
+        .annotate(reviews=Count('id')) \
+        .order_by()
+
+    for row in reviews:
+        counters[row['user_id']]['reviews'] = row['reviews']
+
+    return counters
@@ -0,0 +1,28 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from classification.models import Recomendation
+from users.models import Following
+from users.newsfeed import newsfeed_unfollow
+from users.tasks import newsfeed_fan_out, newsfeed_fill
+
+
+# Keep the followers' newsfeeds up to date. Deleted recomendations leave
+# the newsfeeds by cascade. Saved ones, and the ones of followed users, are
+# added by tasks, once committed
+@receiver(post_save, sender=Recomendation)
+def recomendation_saved(sender, instance, **kwargs):
+    transaction.on_commit(lambda: newsfeed_fan_out.delay(instance.id))
+
+
+@receiver(post_save, sender=Following)
+def following_saved(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: newsfeed_fill.delay(
+            instance.follower_id, instance.followed_id))
+
+
+@receiver(post_delete, sender=Following)
+def following_deleted(sender, instance, **kwargs):
+    newsfeed_unfollow(instance.follower_id, instance.followed_id)
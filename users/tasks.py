@@ -0,0 +1,33 @@
+from celery import shared_task
+
+from classification.models import Recomendation
+from users.models import Following
+from users.newsfeed import newsfeed_add_recomendation, newsfeed_follow
+
+
+# Adds a recomendation to its user's followers' newsfeeds, which takes longer
+# the more followers they have, so it's left out of the request saving it
+@shared_task()
+def newsfeed_fan_out(recomendation_id):
+    recomendation = Recomendation.objects \
+        .filter(id=recomendation_id) \
+        .first()
+
+    # Deleted in the meantime
+    if recomendation is None:
+        return
+
+    newsfeed_add_recomendation(recomendation)
+
+
+# Adds a newly followed user's latest recomendations to the follower's
+# newsfeed, out of the request following them too
+@shared_task()
+def newsfeed_fill(follower_id, followed_id):
+    # Unfollowed in the meantime
+    if not Following.objects \
+            .filter(follower_id=follower_id, followed_id=followed_id) \
+            .exists():
+        return
+
+    newsfeed_follow(follower_id, followed_id)